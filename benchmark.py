@@ -0,0 +1,186 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import game
+import thumbnails
+
+from concurrent.futures import ThreadPoolExecutor
+
+game_log = os.curdir + "/resources/games.txt"
+
+
+def _sample_records(count):
+    """
+    Generates game dictionaries by cycling through the games in the game log
+    Each record gets its own lists, the same way records read from the log do
+    :param count:
+    :return:
+    """
+    templates = list(game.Game.load_all_games(game_log).values())
+    for i in range(count):
+        template = templates[i % len(templates)]
+        yield {
+            'time': float(i),
+            'type': template['type'],
+            'characters': list(template['characters']),
+            'stocks': list(template['stocks']),
+            'stage': template['stage']
+        }
+
+
+def _sample_game_log(count):
+    """
+    Writes a temporary journal game log with count games
+    :param count:
+    :return: path to the game log. The caller removes it
+    """
+    handle, path = tempfile.mkstemp(suffix=".txt")
+    os.close(handle)
+    game.Game._write_journal(path, _sample_records(count))
+    return path
+
+
+def benchmark_memory(count):
+    """
+    Measures how many bytes each Game object loaded from a game log keeps alive
+    :param count: number of games to load
+    :return:
+    """
+    sample_log = _sample_game_log(count)
+    try:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        games = game.Game.load_all_games_sorted(sample_log)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        os.remove(sample_log)
+
+    print("Memory: %i games, %.1f bytes per game" % (len(games), (after - before) / len(games)))
+
+
+def benchmark_columns(count):
+    """
+    Times building the columnar history and the vectorized reports over it
+    :param count: number of games
+    :return:
+    """
+    import game_columns
+
+    start_time = time.perf_counter()
+    columns = game_columns.GameColumns.from_records(_sample_records(count))
+    print("Columns: built %i games in %.3f s" % (len(columns), time.perf_counter() - start_time))
+
+    start_time = time.perf_counter()
+    wins = columns.wins().sum()
+    for mode in game_columns.MODES:
+        columns.character_report(mode=mode, slot=0)
+        columns.character_report(mode=mode, slot=1)
+        columns.stage_report(mode=mode)
+    print("Columns: %i wins, win count plus character and stage reports for every mode in %.3f s" % (
+        wins, time.perf_counter() - start_time))
+
+
+def benchmark_images(workers):
+    """
+    Times decoding every character and stage image from scratch, one at a time and on a thread pool
+    The thumbnail cache is pointed at an empty folder for each run so nothing is served from it
+    :param workers: number of worker threads
+    :return:
+    """
+    jobs = [(path, None) for path in sorted(glob.glob(os.curdir + "/character_images/*.png"))]
+    jobs += [(path, (177, 100)) for path in sorted(glob.glob(os.curdir + "/stage_images/*"))]
+    cache_folder = thumbnails.thumbnail_cache_folder
+
+    for label, pool_size in [("sequential", 0), ("%i threads" % workers, workers)]:
+        thumbnails.thumbnail_cache_folder = tempfile.mkdtemp()
+        try:
+            start_time = time.perf_counter()
+            if pool_size:
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    list(executor.map(lambda job: thumbnails.load_image(*job), jobs))
+            else:
+                for job in jobs:
+                    thumbnails.load_image(*job)
+            print("Images: %i decoded %s in %.3f s" % (len(jobs), label, time.perf_counter() - start_time))
+        finally:
+            shutil.rmtree(thumbnails.thumbnail_cache_folder)
+            thumbnails.thumbnail_cache_folder = cache_folder
+
+
+def benchmark_manifest(count):
+    """
+    Times loading the static resources by parsing the source files and from the compiled manifest
+    :param count: number of repetitions
+    :return:
+    """
+    import characters
+    import manifest
+    import stages
+
+    manifest.load_manifest()
+
+    start_time = time.perf_counter()
+    for _ in range(count):
+        characters.reload()
+        stages.Stage.get_stages(manifest.stage_json)
+    parsed = (time.perf_counter() - start_time) / count
+
+    start_time = time.perf_counter()
+    for _ in range(count):
+        manifest.compile_manifest()
+    compiled = (time.perf_counter() - start_time) / count
+
+    start_time = time.perf_counter()
+    for _ in range(count):
+        resource_manifest = manifest.load_manifest()
+        characters.set_character_data(resource_manifest['characters'])
+        stages.Stage.from_data(resource_manifest['stages'])
+    loaded = (time.perf_counter() - start_time) / count
+
+    print("Manifest: parsing the source files %.2f ms, parsing them and reading image metadata %.2f ms, "
+          "loading the compiled manifest %.2f ms" % (parsed * 1000, compiled * 1000, loaded * 1000))
+
+
+def benchmark_sessions(count):
+    """
+    Times replaying games through the game session engine, the same steps as entering them in the gui
+    :param count: number of games
+    :return:
+    """
+    import characters
+    import game_session
+
+    roster = characters.character_data()
+    records = list(_sample_records(count))
+    start_time = time.perf_counter()
+    for record in records:
+        game_session.replay(record, roster).create_game(record['time'])
+    elapsed = time.perf_counter() - start_time
+    print("Sessions: replayed %i games in %.3f s, %i sessions per second" % (count, elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance benchmarks for smash_gui")
+    parser.add_argument("benchmark", choices=["memory", "columns", "images", "manifest", "sessions"])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.benchmark == "memory":
+        benchmark_memory(args.count)
+    elif args.benchmark == "columns":
+        benchmark_columns(args.count)
+    elif args.benchmark == "images":
+        benchmark_images(args.workers)
+    elif args.benchmark == "manifest":
+        benchmark_manifest(min(args.count, 1000))
+    elif args.benchmark == "sessions":
+        benchmark_sessions(args.count)
+    print("Finished in %.3f s" % (time.perf_counter() - start_time))
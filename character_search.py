@@ -0,0 +1,124 @@
+import json
+import os
+import re
+
+# Queries at least this long are looked up in the trigram index. Shorter queries have an index of their own
+TRIGRAM_LENGTH = 3
+
+aliases_json = os.curdir + "/resources/character_aliases.json"
+
+
+def load_aliases(path=aliases_json):
+    """
+    Reads user defined search aliases. The file is a JSON dictionary of character name to a list of aliases
+    :param path:
+    :return: dictionary, empty if the file doesn't exist
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as alias_file:
+        return json.load(alias_file)
+
+
+def _search_terms(character, aliases):
+    """
+    Every string a character can be found by: its name, display name, game series and aliases
+    Each is lowercased, and also added with underscores as spaces and with the punctuation inside words removed.
+    Spaces are kept, so no term joins the end of one word to the start of the next
+    :param character:
+    :param aliases:
+    :return: set of search terms
+    """
+    terms = set()
+    for field in [character.name, character.display_name, character.game] + list(aliases):
+        field = field.lower()
+        terms.add(field)
+        spaced = field.replace("_", " ")
+        terms.add(spaced)
+        terms.add(re.sub(r"[^a-z0-9 ]", "", spaced))
+    terms.discard("")
+    return terms
+
+
+class CharacterSearchIndex:
+    """
+    Search index over the character roster, built once. A query matches a character if it appears anywhere
+    in one of its search terms
+        An index of every substring shorter than TRIGRAM_LENGTH, which answers short queries directly
+        A trigram index over every search term, used to find the candidates for longer queries
+    Each search remembers its result. When the next query only adds characters to the end of the previous one,
+    it is answered by narrowing the previous result instead of going back to the indexes
+    """
+
+    def __init__(self, characters_data, aliases=None):
+        aliases = aliases or {}
+        self.all_names = set(characters_data.keys())
+        self.terms = {}
+        self.short_substrings = {}
+        self.trigrams = {}
+
+        for name, character in characters_data.items():
+            terms = _search_terms(character, aliases.get(name, []))
+            self.terms[name] = terms
+            for term in terms:
+                for length in range(1, TRIGRAM_LENGTH):
+                    for i in range(len(term) - length + 1):
+                        self.short_substrings.setdefault(term[i:i + length], set()).add(name)
+                for i in range(len(term) - TRIGRAM_LENGTH + 1):
+                    self.trigrams.setdefault(term[i:i + TRIGRAM_LENGTH], set()).add(name)
+
+        self.last_query = ""
+        self.last_result = self.all_names
+
+    def search(self, query):
+        """
+        Finds the characters matching a query
+        :param query:
+        :return: set of character names
+        """
+        query = query.strip().lower()
+        if not query:
+            result = self.all_names
+        elif self.last_query and query.startswith(self.last_query):
+            # Anything containing the new query also contains the last one, so the new result is a subset of it
+            result = {name for name in self.last_result if self._matches(name, query)}
+        elif len(query) < TRIGRAM_LENGTH:
+            result = self.short_substrings.get(query, set())
+        else:
+            result = self._substring_search(query)
+
+        self.last_query = query
+        self.last_result = result
+        return result
+
+    def _substring_search(self, query):
+        """
+        Intersects the characters of every trigram in the query, then checks the few candidates left
+        :param query:
+        :return:
+        """
+        candidates = None
+        for i in range(len(query) - TRIGRAM_LENGTH + 1):
+            names = self.trigrams.get(query[i:i + TRIGRAM_LENGTH], set())
+            candidates = names if candidates is None else candidates & names
+            if not candidates:
+                return set()
+        return {name for name in candidates if self._matches(name, query)}
+
+    def _matches(self, name, query):
+        """
+        Checks a single character against a query
+        :param name:
+        :param query:
+        :return:
+        """
+        return any(query in term for term in self.terms[name])
+
+
+if __name__ == "__main__":
+    import sys
+    import characters
+
+    index = CharacterSearchIndex(characters.character_data(), load_aliases())
+    for argument in sys.argv[1:]:
+        print(argument + ": " + ", ".join(sorted(index.search(argument))))
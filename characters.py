@@ -1,31 +1,85 @@
 import os
-import re
 import json
-import pprint
+
+# Folder that contains resources/characters.txt. Change it with set_resource_root
+root_dir = os.curdir
+
+# Character name to Character object. Loaded the first time it is needed, see character_data
+_registry = None
 
 
 def character_data():
+    """
+    Returns every character as a dictionary of character name to Character object
+    The character file is only parsed on the first call. Every later call returns the same dictionary
+    :return:
+    """
+    global _registry
+    if _registry is None:
+        _registry = _load_character_data()
+    return _registry
+
+
+def reload():
+    """
+    Parses the character file again, replacing the cached characters
+    :return:
+    """
+    global _registry
+    _registry = None
+    return character_data()
+
+
+def set_resource_root(path):
+    """
+    Sets the folder the character file is read from. The characters are loaded from there on next use
+    :param path: folder that contains resources/characters.txt
+    :return:
+    """
+    global root_dir, _registry
+    root_dir = path
+    _registry = None
+
+
+def set_character_data(x_character_data):
+    """
+    Builds the characters from character data that has already been parsed, such as from the resource manifest
+    :param x_character_data: dictionary in the same format as the character file
+    :return:
+    """
+    global _registry
+    _registry = _build_characters(x_character_data)
+    return _registry
+
+
+def _load_character_data():
     character_json = root_dir + "/resources/characters.txt"
     with open(character_json, "r") as data:
         x_character_data = json.load(data)
+    return _build_characters(x_character_data)
 
-        for character_name, character_json in x_character_data.items():
-            image = character_json['img']
-            display_name = character_json['display_name']
-            game = character_json['game']
-            placement = character_json['placement']
 
-            x_character = Character(
-                character_name,
-                image,
-                display_name,
-                game,
-                placement)
-            characters[character_name] = x_character
-    return characters
+def _build_characters(x_character_data):
+    x_characters = {}
+    for character_name, character_json in x_character_data.items():
+        image = character_json['img']
+        display_name = character_json['display_name']
+        game = character_json['game']
+        placement = character_json['placement']
+
+        x_character = Character(
+            character_name,
+            image,
+            display_name,
+            game,
+            placement)
+        x_characters[character_name] = x_character
+    return x_characters
 
 
 class Character:
+    __slots__ = ('name', 'image', 'display_name', 'game', 'placement')
+
     def __init__(self, name, image, display_name, game, placement):
         self.name = name
         self.image = image
@@ -37,24 +91,19 @@ class Character:
         return self.display_name + " (" + self.game + ")"
 
     def __eq__(self, other):
-        if other is not None:
+        if isinstance(other, Character):
             return self.name == other.name
-        else:
-            return False
+        return NotImplemented
+
+    def __hash__(self):
+        # Characters are equal when their names are, so they hash by name too
+        return hash(self.name)
 
     @staticmethod
     def get_character(name):
-        return characters[name]
-
+        return character_data()[name]
 
-root_dir = os.curdir
-characters = {}
-character_data()
 
 if __name__ == '__main__':
-    root_dir = os.curdir
-    characters = {}
-
-    character_data()
-    for character in characters.values():
+    for character in character_data().values():
         print(character)
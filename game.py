@@ -1,28 +1,39 @@
 import characters
+import game_db
 import time
 import os
 import json
-from datetime import datetime
+import argparse
+import sys
+
+# First line of a journal game log. Each following line is one game dictionary
+JOURNAL_HEADER = "#smash_gui game journal v1\n"
+
+# Number of bytes read at a time when reading the journal backwards
+JOURNAL_BLOCK_SIZE = 16384
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 
 class Game:
     """
     Class contains the the data for the game
     Contains factory functions to create games from dictionaries
+    Games are slotted and keep their characters and stocks in tuples, so large histories stay small in memory.
+    Characters are shared references to the Character objects in the character registry
     """
-    def __init__(self, game_characters, stocks, stage="fd", game_time=time.time()):
-        x_characters = []
-        for character in game_characters:
-            if isinstance(character, str):
-                x_characters.append(characters.Character.get_character(character))
-            else:
-                x_characters.append(character)
+    __slots__ = ('characters', 'stocks', 'stage', 'time')
+
+    # Game mode tag. Set by each game mode subclass
+    type = None
 
-        self.characters = x_characters
-        self.stocks = stocks
-        self.stage = stage
+    def __init__(self, game_characters, stocks, stage="fd", game_time=time.time()):
+        self.characters = tuple(characters.Character.get_character(character) if isinstance(character, str)
+                                else character for character in game_characters)
+        self.stocks = tuple(stocks)
+        # Every game on the same stage shares one string
+        self.stage = sys.intern(stage) if isinstance(stage, str) else stage
         self.time = game_time
-        self.type = None
 
     def __lt__(self, other):
         return self.time < other.time
@@ -30,25 +41,61 @@ class Game:
     def record_game(self, game_log):
         """
         Takes the path to the game log and records the instance of this game
-        Needs to load all games from game log first, then appends this game, then writes all games back to log
+        The game is appended to the journal as a single line, so the rest of the log is never read or rewritten.
+        Game logs still in the old JSON dictionary format are migrated to the journal first
         :param game_log: path to game log file
         :return:
         """
-        games = Game.load_all_games(game_log)
-        games[self.time] = self.to_dict()
-        with open(game_log, "w") as log_file:
-            json.dump(games, log_file)
+        Game.record_games(game_log, [self])
+
+    @staticmethod
+    def record_games(game_log, games):
+        """
+        Records several games with a single write and a single flush to disk
+        :param game_log: path to game log file
+        :param games: Game objects
+        :return:
+        """
+        records = sorted((g.to_dict() for g in games), key=Game._record_sort_key)
+        if not records:
+            return
+
+        if game_db.is_game_db(game_log):
+            game_db.GameDatabase(game_log).record_games(records)
+            return
+
+        Game._prepare_journal(game_log)
+
+        # The journal is kept in time order. A game that is not newer than the last recorded one forces a sorted rewrite
+        last_record = next(Game._iter_journal_records_reverse(game_log), None)
+        if last_record is not None and last_record['time'] >= records[0]['time']:
+            all_games = Game.load_all_games(game_log)
+            for record in records:
+                all_games[str(record['time'])] = record
+            Game._write_journal(game_log, all_games.values())
+        else:
+            Game._append_journal(game_log, records)
 
     @staticmethod
     def load_all_games(game_log):
         """
         Reads all games from the game log
         returns a dictionary of all the games as Dictionaries, not game objects
+        Reads the journal, the old JSON dictionary format and SQLite game databases
         :param game_log:
         :return:
         """
-        with open(game_log, "r") as log_file:
-            games = json.load(log_file)
+        if game_db.is_game_db(game_log):
+            return game_db.GameDatabase(game_log).load_all_games()
+
+        if not Game.is_journal(game_log):
+            with open(game_log, "r") as log_file:
+                games = json.load(log_file)
+            return games
+
+        games = {}
+        for record in Game._iter_journal_records(game_log):
+            games[str(record['time'])] = record
         return games
 
     @staticmethod
@@ -59,6 +106,10 @@ class Game:
         :param rev:
         :return:
         """
+        if game_db.is_game_db(game_log):
+            # The database returns the games already sorted
+            return [Game.from_dict(record) for record in game_db.GameDatabase(game_log).query(rev=rev)]
+
         games = Game.load_all_games(game_log)
         game_list = []
         for game_json in games.values():
@@ -70,10 +121,282 @@ class Game:
 
         return game_list
 
+    @staticmethod
+    def iter_games(game_log, start=None, end=None, mode=None, stage=None, character=None, predicate=None,
+                   rev=False):
+        """
+        Yields game objects one at a time in the order they were played, skipping games that don't match the filters
+        Journals and SQLite game databases are streamed, so memory use does not grow with the size of the log.
+        Logs in the old JSON dictionary format have to be loaded completely first
+        :param game_log:
+        :param start: earliest game time, inclusive
+        :param end: latest game time, exclusive
+        :param mode: 'sp', 'mp' or 'ffa'
+        :param stage: stage name
+        :param character: character name that was played in any slot
+        :param predicate: function that takes a Game object and returns True to keep it
+        :param rev: newest game first
+        :return:
+        """
+        for record in Game.iter_records(game_log, start=start, end=end, mode=mode, stage=stage, character=character,
+                                        rev=rev):
+            game_obj = Game.from_dict(record)
+            if predicate is None or predicate(game_obj):
+                yield game_obj
+
+    @staticmethod
+    def iter_records(game_log, start=None, end=None, mode=None, stage=None, character=None, rev=False):
+        """
+        Same as iter_games, but yields the game dictionaries without creating Game objects
+        :return:
+        """
+        if game_db.is_game_db(game_log):
+            # The database applies the filters itself
+            return game_db.GameDatabase(game_log).query(start=start, end=end, mode=mode, stage=stage,
+                                                        character=character, rev=rev)
+
+        # A log that doesn't exist yet has no games. It is created by the first save
+        if Game.log_signature(game_log) is None:
+            return iter(())
+        if not Game.is_journal(game_log):
+            records = sorted(Game.load_all_games(game_log).values(), key=Game._record_sort_key, reverse=rev)
+        elif rev:
+            records = Game._iter_journal_records_reverse(game_log)
+        else:
+            records = Game._iter_journal_records(game_log)
+        return Game._filter_records(records, start, end, mode, stage, character, rev)
+
+    @staticmethod
+    def _filter_records(records, start, end, mode, stage, character, rev):
+        """
+        Filters game dictionaries that are in time order, before they are turned into Game objects
+        Stops reading as soon as the time range has been passed
+        :return:
+        """
+        for record in records:
+            if start is not None and record['time'] < start:
+                if rev:
+                    return
+                continue
+            if end is not None and record['time'] >= end:
+                if not rev:
+                    return
+                continue
+            if mode is not None and record['type'] != mode:
+                continue
+            if stage is not None and record['stage'] != stage:
+                continue
+            if character is not None and character not in record['characters']:
+                continue
+            yield record
+
+    @staticmethod
+    def query_games(game_log, start=None, end=None, mode=None, stage=None, character=None, rev=False):
+        """
+        Returns a list of game objects sorted by time that match all of the given filters
+        SQLite game databases only read the matching rows
+        :param game_log:
+        :param start: earliest game time, inclusive
+        :param end: latest game time, exclusive
+        :param mode: 'sp', 'mp' or 'ffa'
+        :param stage: stage name
+        :param character: character name that was played in any slot
+        :param rev:
+        :return:
+        """
+        return list(Game.iter_games(game_log, start=start, end=end, mode=mode, stage=stage, character=character,
+                                    rev=rev))
+
+    @staticmethod
+    def import_game_log(game_log, database):
+        """
+        Copies every game from a journal or JSON dictionary game log into a SQLite game database
+        :param game_log: path to the game log to read
+        :param database: path to the SQLite game database
+        :return: number of games imported
+        """
+        games = Game.load_all_games(game_log)
+        game_db.GameDatabase(database).record_games(games.values())
+        return len(games)
+
+    @staticmethod
+    def log_signature(game_log):
+        """
+        Returns a cheap fingerprint of the game log (modification time and size)
+        Comparing fingerprints tells whether the log was changed since it was last read
+        :param game_log:
+        :return: tuple, or None if the log does not exist
+        """
+        try:
+            stat = os.stat(game_log)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def is_journal(game_log):
+        """
+        Checks whether the game log is in the append-only journal format
+        Only the header at the start of the file is read
+        :param game_log:
+        :return: True or False
+        """
+        header = JOURNAL_HEADER.encode()
+        with open(game_log, "rb") as log_file:
+            return log_file.read(len(header)) == header
+
+    @staticmethod
+    def migrate_game_log(game_log):
+        """
+        Rewrites a game log in the old JSON dictionary format as a journal sorted by time
+        Does nothing if the log is already a journal
+        :param game_log:
+        :return:
+        """
+        if Game.is_journal(game_log):
+            return
+
+        print("Migrating game log to journal format: " + str(game_log))
+        with open(game_log, "r") as log_file:
+            games = json.load(log_file)
+        Game._write_journal(game_log, games.values())
+
+    @staticmethod
+    def _prepare_journal(game_log):
+        """
+        Makes sure the game log exists and is a journal so that records can be appended to it
+        :param game_log:
+        :return:
+        """
+        if not os.path.exists(game_log) or os.path.getsize(game_log) == 0:
+            Game._write_journal(game_log, [])
+        else:
+            Game.migrate_game_log(game_log)
+
+    @staticmethod
+    def _write_journal(game_log, records):
+        """
+        Writes a complete journal with the records sorted by time
+        The journal is written to a temporary file first and then swapped in, so the log is never half written
+        :param game_log:
+        :param records: game dictionaries
+        :return:
+        """
+        records = sorted(records, key=Game._record_sort_key)
+        temp_log = game_log + ".tmp"
+        with open(temp_log, "w") as log_file:
+            log_file.write(JOURNAL_HEADER)
+            for record in records:
+                log_file.write(json.dumps(record) + "\n")
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        os.replace(temp_log, game_log)
+
+    @staticmethod
+    def _append_journal(game_log, records):
+        """
+        Appends records to the end of the journal and flushes them to disk
+        :param game_log:
+        :param records: game dictionaries
+        :return:
+        """
+        data = "".join(json.dumps(record) + "\n" for record in records).encode()
+        with open(game_log, "a+b") as log_file:
+            # A previous write that was cut off leaves a partial line. Start on a fresh line so this record survives
+            log_file.seek(0, os.SEEK_END)
+            if log_file.tell() > 0:
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != b"\n":
+                    data = b"\n" + data
+            log_file.write(data)
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    @staticmethod
+    def _iter_journal_records(game_log):
+        """
+        Yields the records of the journal from the start of the file, one line at a time
+        :param game_log:
+        :return:
+        """
+        with open(game_log, "rb") as log_file:
+            for line in log_file:
+                record = Game._parse_journal_line(line)
+                if record is not None:
+                    yield record
+
+    @staticmethod
+    def _iter_journal_records_reverse(game_log):
+        """
+        Yields the records of the journal from the end of the file, reading it backwards a block at a time
+        Getting the newest games only reads the end of the file
+        The file is only open while a block is read, so the journal can still be replaced between reads.
+        If the log's fingerprint changed since the last block, the offsets no longer fit the file. Reading starts over
+        from the new end of the file and skips the games that were already yielded
+        :param game_log:
+        :return:
+        """
+        signature = Game.log_signature(game_log)
+        position = signature[1] if signature is not None else 0
+        remainder = b""
+        last_time = None
+        while position > 0:
+            with open(game_log, "rb") as log_file:
+                stat = os.fstat(log_file.fileno())
+                if (stat.st_mtime_ns, stat.st_size) != signature:
+                    signature = stat.st_mtime_ns, stat.st_size
+                    position = stat.st_size
+                    remainder = b""
+                    continue
+
+                block = min(position, JOURNAL_BLOCK_SIZE)
+                position -= block
+                log_file.seek(position)
+                lines = (log_file.read(block) + remainder).split(b"\n")
+
+            # The first line may have started in the block before this one
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                record = Game._parse_journal_line(line)
+                if record is not None and (last_time is None or record['time'] < last_time):
+                    last_time = record['time']
+                    yield record
+
+        record = Game._parse_journal_line(remainder)
+        if record is not None and (last_time is None or record['time'] < last_time):
+            yield record
+
+    @staticmethod
+    def _parse_journal_line(line):
+        """
+        Parses a single journal line
+        :param line:
+        :return: game dictionary, or None for the header, blank lines and lines that were cut off mid write
+        """
+        line = line.strip()
+        if not line or line.startswith(b"#"):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            print("Skipping unreadable game log line: " + str(line))
+            return None
+
     @staticmethod
     def _game_sort_key(g):
         return g.time
 
+    @staticmethod
+    def _record_sort_key(record):
+        return record['time']
+
+    def time_string(self):
+        """
+        Formats the time the game was recorded, in UTC
+        :return:
+        """
+        return time.strftime(TIME_FORMAT, time.gmtime(self.time))
+
     def to_dict(self):
         """
         Takes the current game and translates it to a dictionary so that it can be put into JSON
@@ -117,12 +440,8 @@ class SinglePlayerGame(Game):
     """
     Inherits the Game object. Contains analysis for 1 v 1 games
     """
-    def __init__(self, x_characters, stocks, stage="fd", game_time=time.time()):
-        super().__init__(x_characters,
-                         stocks,
-                         stage,
-                         game_time)
-        self.type = "sp"
+    __slots__ = ()
+    type = "sp"
 
     def __str__(self):
         string = ""
@@ -132,8 +451,7 @@ class SinglePlayerGame(Game):
             string += "L | "
 
         string += self.characters[0].display_name + " " + str(self.stocks[0]) + " | "
-        string += self.characters[1].display_name + " " + str(self.stocks[1]) + " | " + \
-                  datetime.utcfromtimestamp(self.time).strftime('%Y-%m-%d %H:%M:%S')
+        string += self.characters[1].display_name + " " + str(self.stocks[1]) + " | " + self.time_string()
         return string
 
     def is_win(self):
@@ -148,12 +466,8 @@ class MultiPlayerGame(Game):
     """
     Inherits the Game object. Contains analysis for 2 v 2 games
     """
-    def __init__(self, x_characters, stocks, stage="fd", game_time=time.time()):
-        super().__init__(x_characters,
-                         stocks,
-                         stage,
-                         game_time)
-        self.type = "mp"
+    __slots__ = ()
+    type = "mp"
 
     def __str__(self):
         string = ""
@@ -166,7 +480,7 @@ class MultiPlayerGame(Game):
             self.characters[1].display_name, self.stocks[1],
             self.characters[2].display_name, self.stocks[2],
             self.characters[3].display_name, self.stocks[3])
-        string += datetime.utcfromtimestamp(self.time).strftime('%Y-%m-%d %H:%M:%S')
+        string += self.time_string()
         return string
 
     def is_win(self):
@@ -181,12 +495,8 @@ class FreeForAllGame(Game):
     """
     Inherits the Game object. Contains analysis for free for all games
     """
-    def __init__(self, x_characters, stocks, stage="fd", game_time=time.time()):
-        super().__init__(x_characters,
-                         stocks,
-                         stage,
-                         game_time)
-        self.type = "ffa"
+    __slots__ = ()
+    type = "ffa"
 
     def __str__(self):
         string = ""
@@ -199,7 +509,7 @@ class FreeForAllGame(Game):
             self.characters[1].display_name, self.stocks[1],
             self.characters[2].display_name, self.stocks[2],
             self.characters[3].display_name, self.stocks[3])
-        string += datetime.utcfromtimestamp(self.time).strftime('%Y-%m-%d %H:%M:%S')
+        string += self.time_string()
         return string
 
     def is_win(self):
@@ -214,9 +524,19 @@ class FreeForAllGame(Game):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prints the games in a game log in the order they were played")
+    parser.add_argument("game_log", nargs="?", default=os.curdir + "/resources/games.txt")
+    parser.add_argument("--mode", choices=["sp", "mp", "ffa"])
+    parser.add_argument("--stage")
+    parser.add_argument("--character", help="only games where this character was played in any slot")
+    parser.add_argument("--rev", action="store_true", help="newest game first")
+    args = parser.parse_args()
 
-    game_log_path = os.curdir + "/resources/games.txt"
-    games = Game.load_all_games_sorted(game_log_path)
-
-    for game in games:
+    wins = 0
+    total = 0
+    for game in Game.iter_games(args.game_log, mode=args.mode, stage=args.stage, character=args.character,
+                                rev=args.rev):
         print(game)
+        wins += game.is_win()
+        total += 1
+    print("%i games, %i wins" % (total, wins))
@@ -0,0 +1,151 @@
+import numpy as np
+
+import characters
+import game
+
+MODES = ['sp', 'mp', 'ffa']
+
+# Every game mode has at most 4 players. Unused slots hold -1
+MAX_PLAYERS = 4
+
+
+class GameColumns:
+    """
+    Columnar, in-memory copy of a game log for analytics over the whole history
+    Each game is one row across a set of NumPy arrays:
+        time: float64 timestamps
+        modes: int8 codes into MODES
+        stages: int16 codes into stage_names
+        characters: int16 codes into character_names, one column per player slot
+        stocks: int8 stocks, one column per player slot
+    """
+
+    def __init__(self, time, modes, stages, character_codes, stocks, stage_names, character_names):
+        self.time = time
+        self.modes = modes
+        self.stages = stages
+        self.characters = character_codes
+        self.stocks = stocks
+        self.stage_names = stage_names
+        self.character_names = character_names
+        self._wins = None
+
+    def __len__(self):
+        return len(self.time)
+
+    @staticmethod
+    def from_records(records):
+        """
+        Builds the columns from game dictionaries
+        The records are consumed one at a time, so a streamed game log is never held in memory as Game objects
+        :param records: game dictionaries
+        :return:
+        """
+        character_names = sorted(characters.character_data().keys())
+        character_codes = {name: code for code, name in enumerate(character_names)}
+        mode_codes = {mode: code for code, mode in enumerate(MODES)}
+        stage_names = []
+        stage_codes = {}
+
+        time_column = []
+        mode_column = []
+        stage_column = []
+        character_rows = []
+        stock_rows = []
+        padding = [-1] * MAX_PLAYERS
+        for record in records:
+            stage = record['stage']
+            if stage not in stage_codes:
+                stage_codes[stage] = len(stage_names)
+                stage_names.append(stage)
+            slots = len(record['characters'])
+
+            time_column.append(record['time'])
+            mode_column.append(mode_codes[record['type']])
+            stage_column.append(stage_codes[stage])
+            character_rows.append([character_codes[name] for name in record['characters']] + padding[slots:])
+            stock_rows.append(list(record['stocks']) + padding[slots:])
+
+        return GameColumns(np.array(time_column, dtype=np.float64),
+                           np.array(mode_column, dtype=np.int8),
+                           np.array(stage_column, dtype=np.int16),
+                           np.array(character_rows, dtype=np.int16).reshape(-1, MAX_PLAYERS),
+                           np.array(stock_rows, dtype=np.int8).reshape(-1, MAX_PLAYERS),
+                           stage_names,
+                           character_names)
+
+    @staticmethod
+    def from_game_log(game_log):
+        """
+        Builds the columns from every game in a game log, in time order
+        :param game_log:
+        :return:
+        """
+        return GameColumns.from_records(game.Game.iter_records(game_log))
+
+    def mode_mask(self, mode):
+        return self.modes == MODES.index(mode)
+
+    def wins(self):
+        """
+        Works out whether the user won each game, with the same rules as the is_win method of each game mode
+            sp: more stocks than the opponent
+            mp: the users team has more total stocks than the other team
+            ffa: no opponent has more stocks than the user
+        Computed once, the columns do not change after they are built
+        :return: boolean array, one entry per game
+        """
+        if self._wins is not None:
+            return self._wins
+
+        stocks = self.stocks.astype(np.int16)
+        sp_win = stocks[:, 0] > stocks[:, 1]
+        mp_win = stocks[:, 0] + stocks[:, 1] > stocks[:, 2] + stocks[:, 3]
+        ffa_win = stocks[:, 0] >= stocks[:, 1:].max(axis=1)
+        self._wins = np.select([self.mode_mask('sp'), self.mode_mask('mp'), self.mode_mask('ffa')],
+                               [sp_win, mp_win, ffa_win], default=False)
+        return self._wins
+
+    def character_report(self, mode=None, slot=0):
+        """
+        Counts games and wins for every character played in a player slot
+        :param mode: only count games of this mode. All modes if None
+        :param slot: player slot. 0 is the user
+        :return: dictionary of character name to (games, wins), for characters with at least one game
+        """
+        mask = self.characters[:, slot] >= 0
+        if mode is not None:
+            mask &= self.mode_mask(mode)
+        codes = self.characters[mask, slot]
+        games = np.bincount(codes, minlength=len(self.character_names))
+        wins = np.bincount(codes, weights=self.wins()[mask], minlength=len(self.character_names))
+
+        report = {}
+        for code in np.flatnonzero(games):
+            report[self.character_names[code]] = (int(games[code]), int(wins[code]))
+        return report
+
+    def stage_report(self, mode=None):
+        """
+        Counts games and wins on every stage
+        :param mode: only count games of this mode. All modes if None
+        :return: dictionary of stage name to (games, wins)
+        """
+        mask = np.ones(len(self), dtype=bool) if mode is None else self.mode_mask(mode)
+        codes = self.stages[mask]
+        games = np.bincount(codes, minlength=len(self.stage_names))
+        wins = np.bincount(codes, weights=self.wins()[mask], minlength=len(self.stage_names))
+
+        report = {}
+        for code in np.flatnonzero(games):
+            report[self.stage_names[code]] = (int(games[code]), int(wins[code]))
+        return report
+
+
+if __name__ == "__main__":
+    import os
+
+    columns = GameColumns.from_game_log(os.curdir + "/resources/games.txt")
+    print("%i games, %i wins" % (len(columns), columns.wins().sum()))
+    for name, (games, wins) in sorted(columns.character_report(mode='sp', slot=1).items()):
+        print("vs %s: %i games, %i wins" % (name, games, wins))
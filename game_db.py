@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+# Game logs with these extensions are stored in SQLite instead of the journal
+GAME_DB_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Rows read per query. Each page is read with its own connection, so no read lock is held between pages
+QUERY_PAGE_SIZE = 1000
+
+# Every game mode has at most 4 players
+MAX_PLAYERS = 4
+
+CHARACTER_COLUMNS = ["character%i" % i for i in range(MAX_PLAYERS)]
+STOCK_COLUMNS = ["stocks%i" % i for i in range(MAX_PLAYERS)]
+COLUMNS = ["time", "type", "stage"] + CHARACTER_COLUMNS + STOCK_COLUMNS
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS games ("
+    "time REAL PRIMARY KEY, type TEXT NOT NULL, stage TEXT, " +
+    ", ".join(column + " TEXT" for column in CHARACTER_COLUMNS) + ", " +
+    ", ".join(column + " INTEGER" for column in STOCK_COLUMNS) + ")",
+    "CREATE INDEX IF NOT EXISTS games_type ON games (type, time)",
+    "CREATE INDEX IF NOT EXISTS games_stage ON games (stage, time)",
+] + ["CREATE INDEX IF NOT EXISTS games_%s ON games (%s, time)" % (column, column) for column in CHARACTER_COLUMNS]
+
+# Absolute paths of the databases whose schema has been set up by this process
+_initialized_paths = set()
+
+
+def is_game_db(game_log):
+    """
+    Checks whether the game log path points to a SQLite game database
+    :param game_log:
+    :return: True or False
+    """
+    return os.path.splitext(str(game_log))[1].lower() in GAME_DB_EXTENSIONS
+
+
+class GameDatabase:
+    """
+    SQLite storage for games.
+    Games go in and come out as the same dictionaries that Game.to_dict and Game.from_dict use
+    There is one column per player slot for characters and stocks so every filter can use an index
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # A GameDatabase is made for every read and write, so the schema is only set up the first time
+        key = os.path.abspath(path)
+        if key not in _initialized_paths:
+            with closing(self._connect()) as conn:
+                with conn:
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+            _initialized_paths.add(key)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def record_games(self, records):
+        """
+        Inserts game dictionaries in a single transaction. A game with the same time replaces the old one
+        :param records: game dictionaries
+        :return:
+        """
+        rows = [GameDatabase._to_row(record) for record in records]
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO games (%s) VALUES (%s)" % (
+                    ", ".join(COLUMNS), ", ".join("?" * len(COLUMNS))), rows)
+
+    def query(self, start=None, end=None, mode=None, stage=None, character=None, slot=None, rev=False):
+        """
+        Yields game dictionaries ordered by time that match all of the given filters
+        Rows are read a page at a time, each page with its own short query that continues after the time of the
+        last row. A generator that is only partly read doesn't keep the database open or block writers
+        :param start: earliest game time, inclusive
+        :param end: latest game time, exclusive
+        :param mode: 'sp', 'mp' or 'ffa'
+        :param stage: stage name
+        :param character: character name
+        :param slot: player slot the character has to be in. Any slot if None
+        :param rev: newest game first
+        :return:
+        """
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("time >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("time < ?")
+            params.append(end)
+        if mode is not None:
+            clauses.append("type = ?")
+            params.append(mode)
+        if stage is not None:
+            clauses.append("stage = ?")
+            params.append(stage)
+        if character is not None:
+            if slot is not None:
+                clauses.append(CHARACTER_COLUMNS[slot] + " = ?")
+                params.append(character)
+            else:
+                # Written as ORs so SQLite can use the index of each slot
+                clauses.append("(" + " OR ".join(column + " = ?" for column in CHARACTER_COLUMNS) + ")")
+                params.extend([character] * MAX_PLAYERS)
+
+        last_time = None
+        while True:
+            page_clauses = list(clauses)
+            page_params = list(params)
+            if last_time is not None:
+                page_clauses.append("time < ?" if rev else "time > ?")
+                page_params.append(last_time)
+
+            sql = "SELECT %s FROM games" % ", ".join(COLUMNS)
+            if page_clauses:
+                sql += " WHERE " + " AND ".join(page_clauses)
+            sql += " ORDER BY time" + (" DESC" if rev else "") + " LIMIT ?"
+            page_params.append(QUERY_PAGE_SIZE)
+
+            with closing(self._connect()) as conn:
+                rows = conn.execute(sql, page_params).fetchall()
+            for row in rows:
+                yield GameDatabase._from_row(row)
+
+            if len(rows) < QUERY_PAGE_SIZE:
+                return
+            last_time = rows[-1][0]
+
+    def load_all_games(self):
+        """
+        Returns a dictionary of all the games as Dictionaries keyed by their time, like Game.load_all_games
+        :return:
+        """
+        games = {}
+        for record in self.query():
+            games[str(record['time'])] = record
+        return games
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    @staticmethod
+    def _to_row(record):
+        characters = list(record['characters'])
+        stocks = list(record['stocks'])
+        padding = [None] * (MAX_PLAYERS - len(characters))
+        return [record['time'], record['type'], record['stage']] + characters + padding + stocks + padding
+
+    @staticmethod
+    def _from_row(row):
+        game_time, game_type, stage = row[0:3]
+        characters = [character for character in row[3:3 + MAX_PLAYERS] if character is not None]
+        stocks = list(row[3 + MAX_PLAYERS:3 + MAX_PLAYERS + len(characters)])
+        return {
+            'time': game_time,
+            'type': game_type,
+            'characters': characters,
+            'stocks': stocks,
+            'stage': stage
+        }
+
+
+if __name__ == "__main__":
+    import game
+
+    # Usage: python game_db.py [source game log] [database]
+    source_log = sys.argv[1] if len(sys.argv) > 1 else os.curdir + "/resources/games.txt"
+    database_path = sys.argv[2] if len(sys.argv) > 2 else os.curdir + "/resources/games.db"
+
+    imported = game.Game.import_game_log(source_log, database_path)
+    print("Imported %i games from %s into %s" % (imported, source_log, database_path))
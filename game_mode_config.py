@@ -7,16 +7,14 @@ character_tracker = {
             "stocks": 0,
             "color": colors.SMASH_RED,
             "display_player": "Player` 1",
-            "short_name": "P1",
-            "ccg": None  # Current Character Gui},
+            "short_name": "P1"
         },
         'opp': {
             "character": None,
             "stocks": 0,
             "color": colors.SMASH_BLUE,
             "display_player": "Player 2",
-            "short_name": "P2",
-            "ccg": None  # Current Character Gui
+            "short_name": "P2"
         }
     },
     'mp': {
@@ -25,32 +23,28 @@ character_tracker = {
             "stocks": 0,
             "color": colors.SMASH_RED,
             "display_player": "Player 1",
-            "short_name": "P1",
-            "ccg": None  # Current Character Gui
+            "short_name": "P1"
         },
         'own2': {
             "character": None,
             "stocks": 0,
             "color": colors.SMASH_RED,
             "short_name": "P2",
-            "display_player": "Player 2",
-            "ccg": None  # Current Character Gui
+            "display_player": "Player 2"
         },
         'opp1': {
             "character": None,
             "stocks": 0,
             "color": colors.SMASH_BLUE,
             "short_name": "P3",
-            "display_player": "Player 3",
-            "ccg": None  # Current Character Gui
+            "display_player": "Player 3"
         },
         'opp2' : {
             "character": None,
             "stocks": 0,
             "color": colors.SMASH_BLUE,
             "display_player": "Player 4",
-            "short_name": "P4",
-            "ccg": None  # Current Character Gui
+            "short_name": "P4"
         }
     },
     'ffa': {
@@ -59,32 +53,28 @@ character_tracker = {
                 "stocks": 0,
                 "color": colors.SMASH_RED,
                 "display_player": "Player 1",
-                "short_name": "P1",
-                "ccg": None  # Current Character Gui
+                "short_name": "P1"
             },
         'opp1': {
                 "character": None,
                 "stocks": 0,
                 "color": colors.SMASH_BLUE,
                 "short_name": "P2",
-                "display_player": "Player 2",
-                "ccg": None  # Current Character Gui
+                "display_player": "Player 2"
             },
         'opp2': {
                 "character": None,
                 "stocks": 0,
                 "color": colors.SMASH_YELLOW,
                 "short_name": "P3",
-                "display_player": "Player 3",
-                "ccg": None  # Current Character Gui
+                "display_player": "Player 3"
             },
         'opp3': {
                 "character": None,
                 "stocks": 0,
                 "color": colors.SMASH_GREEN,
                 "display_player": "Player 4",
-                "short_name": "P4",
-                "ccg": None  # Current Character Gui
+                "short_name": "P4"
             }
     }
 }
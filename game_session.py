@@ -0,0 +1,136 @@
+import time
+
+import characters
+import game
+import game_mode_config
+
+
+class GameSession:
+    """
+    The state of a game while it is being entered: each player's character and stocks, the stage,
+    and which player picks the next character
+    Has no Tk code, so the gui drives it and scripts can run sessions without a display.
+    Each session copies the player config of its game mode from game_mode_config, so sessions never share state
+        players: player key -> {'character', 'stocks', 'color', 'display_player', 'short_name'}
+        turn_keys: player keys in the order they pick, the same order as in game_mode_config
+    """
+
+    def __init__(self, mode, stage="final_destination"):
+        self.type = mode
+        self.stage = stage
+        self.players = {key: dict(config) for key, config in game_mode_config.character_tracker[mode].items()}
+        self.turn_keys = list(self.players.keys())
+        self.turn_index = 0
+
+    @property
+    def selection_turn(self):
+        """
+        :return: key of the player the next selected character is given to
+        """
+        return self.turn_keys[self.turn_index]
+
+    def set_turn(self, key):
+        """
+        Sets which player the next selected character will be assigned to
+        :param key:
+        :return:
+        """
+        self.turn_index = self.turn_keys.index(key)
+
+    def next_selection_turn(self):
+        """
+        Moves the turn to the next player in the logical order
+        :return: key of the player whose turn it is now
+        """
+        self.turn_index = (self.turn_index + 1) % len(self.turn_keys)
+        return self.selection_turn
+
+    def select_character(self, character):
+        """
+        Gives a character to the player whose turn it is. Selecting the player's current character again deselects it
+        Giving the player a new character moves the turn to the next player
+        :param character:
+        :return: the character the player had before, or None
+        """
+        player = self.players[self.selection_turn]
+        previous_character = player["character"]
+        player["character"] = None
+
+        if previous_character != character:
+            player["character"] = character
+            self.next_selection_turn()
+        return previous_character
+
+    def set_stock(self, key, num):
+        """
+        Sets the stocks a player had left at the end of the game
+        :param key:
+        :param num:
+        :return:
+        """
+        self.players[key]["stocks"] = num
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def ready_to_save(self):
+        """
+        Checks whether all necessary data is present to create a game object.
+        :return: True or False
+        """
+        for player in self.players.values():
+            if player["character"] is None or player["stocks"] is None:
+                return False
+        return True
+
+    def assemble_game_dict(self, game_time=None):
+        """
+        Transforms the players' selections into a dictionary structure that can be parsed into a Game Object
+        :param game_time: defaults to now
+        :return: game object dictionary structure
+        """
+        return {
+            'time': time.time() if game_time is None else game_time,
+            'type': self.type,
+            'characters': [self.players[key]["character"] for key in self.turn_keys],
+            'stocks': [self.players[key]["stocks"] for key in self.turn_keys],
+            'stage': self.stage
+        }
+
+    def create_game(self, game_time=None):
+        """
+        :param game_time: defaults to now
+        :return: Game object for the current selections
+        """
+        return game.Game.from_dict(self.assemble_game_dict(game_time))
+
+    def reset(self):
+        """
+        Clears every player's character and stocks for the next game. The stage is kept
+        :return: dictionary of player key -> the character they had, for the players that had one
+        """
+        previous_characters = {}
+        for key, player in self.players.items():
+            if player["character"] is not None:
+                previous_characters[key] = player["character"]
+            player["character"] = None
+            player["stocks"] = 0
+        self.turn_index = 0
+        return previous_characters
+
+
+def replay(record, roster=None):
+    """
+    Enters a game dictionary the way the gui does: each player picks their character in turn,
+    then the stocks and stage are set
+    :param record: game dictionary with character names, as stored in the game log
+    :param roster: character name -> Character. Defaults to characters.character_data()
+    :return: GameSession holding the game, ready to save
+    """
+    roster = roster or characters.character_data()
+    session = GameSession(record['type'], stage=record['stage'])
+    for name, stocks in zip(record['characters'], record['stocks']):
+        key = session.selection_turn
+        session.select_character(roster[name])
+        session.set_stock(key, stocks)
+    return session
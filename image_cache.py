@@ -0,0 +1,147 @@
+import os
+import threading
+
+from collections import OrderedDict
+
+from PIL import ImageTk
+
+import thumbnails
+
+# Functions that make a variant of an image from its decoded pixels, by variant name. None are needed yet
+VARIANTS = {}
+
+# Bytes per pixel of a PhotoImage. Tk keeps every photo as 32 bit RGBA
+PHOTO_BYTES_PER_PIXEL = 4
+
+
+class ImageCache:
+    """
+    Decoded images shared by every widget, keyed by (path, size, variant)
+        size: (width, height) the image is resized to, or None for the original size
+        variant: name of a function in VARIANTS applied after resizing, or None
+    Each entry holds the decoded pixels as a PIL image, and the PhotoImage made from them once one has been asked for.
+    Missing entries are made from pixels already in memory where possible: a resize of the original size,
+    or a variant of the resized image. Otherwise the image is read through the thumbnail cache.
+    Entries are evicted least recently used first once their total size is over the memory budget.
+    Widgets keep their PhotoImage alive with their own reference, so evicting an entry never blanks a widget,
+    it only means the next request for it decodes again.
+    Pixels can be requested from any thread. PhotoImages must only be requested on the Tk main thread
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        # key -> [PIL image, PhotoImage or None, bytes used], least recently used first
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path, size=None, variant=None):
+        return os.path.normpath(path), tuple(size) if size else None, variant
+
+    def get_pixels(self, path, size=None, variant=None):
+        """
+        Returns the decoded pixels of an image, decoding and caching them if needed
+        :param path:
+        :param size:
+        :param variant:
+        :return: PIL image. Shared, so it must not be modified
+        """
+        key = ImageCache.key(path, size, variant)
+        image = self._lookup(key)
+        if image is not None:
+            return image
+
+        if variant is not None:
+            image = VARIANTS[variant](self.get_pixels(path, size))
+        else:
+            original = self._lookup(ImageCache.key(path)) if size is not None else None
+            if original is not None:
+                image = original.resize(key[1])
+            else:
+                image = thumbnails.load_image(path, key[1])
+        self.put_pixels(key, image)
+        return image
+
+    def put_pixels(self, key, image):
+        """
+        Adds decoded pixels that were made elsewhere, such as images cut out of an atlas
+        :param key: from ImageCache.key
+        :param image: PIL image
+        :return:
+        """
+        with self.lock:
+            self._remove(key)
+            cost = image.size[0] * image.size[1] * len(image.getbands())
+            self.entries[key] = [image, None, cost]
+            self.used_bytes += cost
+            self._evict()
+
+    def get_photo(self, path, size=None, variant=None, pixels=None):
+        """
+        Returns the shared PhotoImage of an image, making it from the cached pixels if needed
+        Main thread only
+        :param path:
+        :param size:
+        :param variant:
+        :param pixels: PIL image already decoded for this key. Used if there is no PhotoImage yet,
+            so nothing is decoded on the main thread even if the cached pixels were evicted
+        :return: PhotoImage
+        """
+        photo = self.cached_photo(path, size, variant)
+        if photo is not None:
+            return photo
+
+        image = pixels if pixels is not None else self.get_pixels(path, size, variant)
+        photo = ImageTk.PhotoImage(image)
+        key = ImageCache.key(path, size, variant)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [image, None, image.size[0] * image.size[1] * len(image.getbands())]
+                self.used_bytes += entry[2]
+            # Most recently used, so adding the photo's cost can't evict the entry it is stored in
+            self.entries.move_to_end(key)
+            entry[1] = photo
+            photo_cost = photo.width() * photo.height() * PHOTO_BYTES_PER_PIXEL
+            entry[2] += photo_cost
+            self.used_bytes += photo_cost
+            self._evict()
+        return photo
+
+    def cached_photo(self, path, size=None, variant=None):
+        """
+        :param path:
+        :param size:
+        :param variant:
+        :return: the shared PhotoImage of an image if it is cached, otherwise None. Nothing is decoded
+        """
+        key = ImageCache.key(path, size, variant)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def _lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used_bytes -= entry[2]
+
+    def _evict(self):
+        """
+        Drops the least recently used entries until the cache fits its budget. The newest entry is always kept
+        :return:
+        """
+        while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+            entry = self.entries.popitem(last=False)[1]
+            self.used_bytes -= entry[2]
@@ -0,0 +1,106 @@
+import json
+import math
+import time
+import tkinter as tk
+
+from contextlib import contextmanager
+
+PERCENTILES = (50, 95, 99)
+# Upper bounds of the histogram buckets in milliseconds. Slower samples go in a last, open ended bucket
+HISTOGRAM_BUCKETS_MS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+# How often the debug overlay redraws its table
+OVERLAY_REFRESH_MS = 1000
+
+
+class LatencyRecorder:
+    """
+    Measures how long user actions take to show on screen
+    An action is timed from the moment its event handler starts until the first idle callback after it returns.
+    Tk redraws widgets in idle callbacks, and the ones the handler caused are queued before ours,
+    so by then the result of the action has been drawn
+    Samples are kept per action. A disabled recorder does nothing, so the gui can always call it
+    """
+
+    def __init__(self, widget, enabled=False):
+        self.widget = widget
+        self.enabled = enabled
+        # action -> latencies in seconds, in the order they were measured
+        self.samples = {}
+
+    @contextmanager
+    def measure(self, action, start_time=None):
+        """
+        Times the event handler inside the with block, up to the next idle callback
+        :param action: name the sample is recorded under
+        :param start_time: time.perf_counter() of the event that started the action, if it was earlier than the
+            handler, such as the key press of a debounced search. Defaults to when the with block is entered
+        :return:
+        """
+        if not self.enabled:
+            yield
+            return
+
+        if start_time is None:
+            start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.widget.after_idle(lambda: self.samples.setdefault(action, []).append(
+                time.perf_counter() - start_time))
+
+    def summary(self, action):
+        """
+        :param action:
+        :return: dictionary with the count, percentiles, max and histogram of an action's latencies in milliseconds
+        """
+        samples = sorted(self.samples[action])
+        d = {'count': len(samples)}
+        for percentile in PERCENTILES:
+            rank = max(1, math.ceil(percentile / 100 * len(samples)))
+            d['p%i' % percentile] = samples[rank - 1] * 1000
+        d['max'] = samples[-1] * 1000
+
+        histogram = {}
+        for sample in samples:
+            bucket = next((str(bound) for bound in HISTOGRAM_BUCKETS_MS if sample * 1000 <= bound),
+                          ">%i" % HISTOGRAM_BUCKETS_MS[-1])
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        d['histogram_ms'] = histogram
+        return d
+
+    def report(self):
+        """
+        :return: table of every action's latency percentiles
+        """
+        lines = ["%-24s %6s %8s %8s %8s %8s" % ("action (ms)", "count", "p50", "p95", "p99", "max")]
+        for action in sorted(self.samples):
+            d = self.summary(action)
+            lines.append("%-24s %6i %8.1f %8.1f %8.1f %8.1f" % (action, d['count'], d['p50'], d['p95'], d['p99'],
+                                                               d['max']))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Writes the summary of every action to a JSON file
+        :param path:
+        :return:
+        """
+        with open(path, "w") as latency_file:
+            json.dump({action: self.summary(action) for action in sorted(self.samples)}, latency_file, indent=2)
+
+
+class LatencyOverlay(tk.Label):
+    """
+    Debug overlay in the top right corner of the window with the latency table, refreshed every OVERLAY_REFRESH_MS
+    """
+
+    def __init__(self, master, recorder):
+        super().__init__(master, font=("Consolas", 9), justify='left', anchor='nw', bg='black', fg='#66ff66')
+        self.recorder = recorder
+        self.place(relx=1.0, rely=0.0, anchor='ne')
+        self._refresh()
+
+    def _refresh(self):
+        self.configure(text=self.recorder.report())
+        self.lift()
+        self.after(OVERLAY_REFRESH_MS, self._refresh)
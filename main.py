@@ -1,6 +1,4 @@
 from smash_gui import *
 
 if __name__ == "__main__":
-    root = SmashApp()
-    app = SmashGui(master=root)
-    app.mainloop()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+import json
+import os
+import pickle
+
+character_json = os.curdir + "/resources/characters.txt"
+stage_json = os.curdir + "/resources/stages.json"
+character_image_folder = os.curdir + "/character_images"
+stage_image_folder = os.curdir + "/stage_images"
+manifest_path = os.curdir + "/resources/.manifest.pickle"
+
+# Bump when the layout of the manifest changes so old manifests are recompiled
+MANIFEST_VERSION = 1
+
+
+def _source_stamp(path):
+    """
+    :param path:
+    :return: (modification time, size) of a file, or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_manifest():
+    """
+    Returns all static resource metadata from the compiled manifest, in a single read
+    The manifest is recompiled if it is missing or any of its source files have changed. Sources are only stat'ed
+        characters: parsed character file
+        stages: parsed stage json
+        character_images / stage_images: image name -> {'path', 'size', 'stamp'} with size as (width, height)
+    :return: dictionary
+    """
+    try:
+        with open(manifest_path, "rb") as manifest_file:
+            manifest = pickle.load(manifest_file)
+        if manifest['version'] == MANIFEST_VERSION and all(
+                _source_stamp(path) == stamp for path, stamp in manifest['sources'].items()):
+            return manifest
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        pass
+
+    print("Compiling resource manifest")
+    manifest = compile_manifest()
+    save_manifest(manifest)
+    return manifest
+
+
+def compile_manifest():
+    """
+    Parses the character and stage files and reads the header of every image they reference
+    :return: manifest dictionary
+    """
+    from PIL import Image
+
+    sources = {}
+    with open(character_json, "r") as data:
+        character_data = json.load(data)
+    sources[character_json] = _source_stamp(character_json)
+    with open(stage_json, "r") as data:
+        stage_data = json.load(data)
+    sources[stage_json] = _source_stamp(stage_json)
+
+    def image_metadata(folder, image_names):
+        images = {}
+        for image_name in image_names:
+            path = folder + "/" + image_name
+            stamp = _source_stamp(path)
+            sources[path] = stamp
+            size = None
+            if stamp is not None:
+                # Opening a PIL image only reads the header, the pixels aren't decoded
+                with Image.open(path) as image:
+                    size = image.size
+            images[image_name] = {'path': path, 'size': size, 'stamp': stamp}
+        return images
+
+    return {
+        'version': MANIFEST_VERSION,
+        'sources': sources,
+        'characters': character_data,
+        'stages': stage_data,
+        'character_images': image_metadata(character_image_folder,
+                                           [value['img'] for value in character_data.values()]),
+        'stage_images': image_metadata(stage_image_folder, [value['img'] for value in stage_data.values()])
+    }
+
+
+def save_manifest(manifest):
+    """
+    Writes the manifest. Failing to write only costs the next launch a recompile
+    :param manifest:
+    :return:
+    """
+    temp_path = manifest_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as manifest_file:
+            pickle.dump(manifest, manifest_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, manifest_path)
+    except OSError as e:
+        print("Could not save resource manifest: " + str(e))
+
+
+if __name__ == "__main__":
+    x_manifest = load_manifest()
+    print("%i characters, %i stages, %i source files" % (len(x_manifest['characters']), len(x_manifest['stages']),
+                                                         len(x_manifest['sources'])))
@@ -0,0 +1,158 @@
+import copy
+import json
+import os
+
+import game
+
+# The matchup file is kept next to the game log it summarizes
+MATCHUP_SUFFIX = ".matchups.json"
+
+
+class MatchupStats:
+    """
+    Win and loss counts that are updated one game at a time, so they never need a scan of the game history
+        head_to_head: own character -> opponent character -> [wins, losses] for 1 v 1 games
+        mode_records: mode -> character -> [wins, losses] for the user's characters in 2 v 2 and free for all games
+    The counts are saved next to the game log together with the log's fingerprint.
+    If the log was changed by something else the fingerprints won't match and the counts are rebuilt from the log
+    """
+
+    def __init__(self, game_log):
+        self.game_log = game_log
+        self.path = game_log + MATCHUP_SUFFIX
+        self.head_to_head = {}
+        self.mode_records = {'mp': {}, 'ffa': {}}
+        self.log_signature = None
+
+    @staticmethod
+    def load(game_log):
+        """
+        Loads the saved counts for a game log. Rebuilds and saves them if they are missing or out of date
+        :param game_log:
+        :return:
+        """
+        stats = MatchupStats(game_log)
+        current_signature = game.Game.log_signature(game_log)
+        try:
+            with open(stats.path, "r") as matchup_file:
+                d = json.load(matchup_file)
+            if d['log_signature'] is not None and tuple(d['log_signature']) == current_signature:
+                stats.head_to_head = d['head_to_head']
+                stats.mode_records = d['mode_records']
+                stats.log_signature = current_signature
+                return stats
+        except (OSError, ValueError, KeyError):
+            pass
+
+        stats.rebuild()
+        return stats
+
+    def rebuild(self):
+        """
+        Recounts every game in the game log and saves the result
+        :return:
+        """
+        print("Rebuilding matchup stats from " + str(self.game_log))
+        self.head_to_head = {}
+        self.mode_records = {'mp': {}, 'ffa': {}}
+        self.log_signature = game.Game.log_signature(self.game_log)
+        if self.log_signature is not None:
+            for game_obj in game.Game.iter_games(self.game_log):
+                self.add_game(game_obj)
+        self.save()
+
+    def record(self, game_objs, log_signature):
+        """
+        Counts games that were just written to the game log and saves the counts
+        :param game_objs:
+        :param log_signature: fingerprint of the game log right after the games were written
+        :return:
+        """
+        for game_obj in game_objs:
+            self.add_game(game_obj)
+        self.log_signature = log_signature
+        self.save()
+
+    def update_after_write(self, game_objs, signature_before, signature_after):
+        """
+        Brings the counts up to date once games have been written to the game log, and saves them
+        Meant to run on the save queue's writer thread, so counting, saving and rebuilding never block the gui.
+        The counts are rebuilt if something else changed the log since they were last saved
+        :param game_objs: games that were just written
+        :param signature_before: fingerprint of the game log right before the games were written
+        :param signature_after: fingerprint of the game log right after the games were written
+        :return: copy of the counts that the gui can read while this object keeps changing
+        """
+        if signature_before != self.log_signature:
+            self.rebuild()
+        else:
+            self.record(game_objs, signature_after)
+        return self.copy()
+
+    def copy(self):
+        """
+        :return: MatchupStats with its own copy of the counts
+        """
+        stats = MatchupStats(self.game_log)
+        stats.head_to_head = copy.deepcopy(self.head_to_head)
+        stats.mode_records = copy.deepcopy(self.mode_records)
+        stats.log_signature = self.log_signature
+        return stats
+
+    def add_game(self, game_obj):
+        """
+        Adds a single game to the counts
+        :param game_obj:
+        :return:
+        """
+        result = 0 if game_obj.is_win() else 1
+        if game_obj.type == 'sp':
+            own, opp = game_obj.characters[0].name, game_obj.characters[1].name
+            counts = self.head_to_head.setdefault(own, {}).setdefault(opp, [0, 0])
+            counts[result] += 1
+        elif game_obj.type == 'mp':
+            for character in game_obj.characters[0:2]:
+                self.mode_records['mp'].setdefault(character.name, [0, 0])[result] += 1
+        elif game_obj.type == 'ffa':
+            self.mode_records['ffa'].setdefault(game_obj.characters[0].name, [0, 0])[result] += 1
+
+    def head_to_head_record(self, own, opp):
+        """
+        Returns the 1 v 1 record of one character against another
+        :param own: name of the user's character
+        :param opp: name of the opponent's character
+        :return: (wins, losses)
+        """
+        wins, losses = self.head_to_head.get(own, {}).get(opp, [0, 0])
+        return wins, losses
+
+    def mode_record(self, mode, character):
+        """
+        Returns the record of the user's character in 2 v 2 or free for all games
+        :param mode: 'mp' or 'ffa'
+        :param character: character name
+        :return: (wins, losses)
+        """
+        wins, losses = self.mode_records[mode].get(character, [0, 0])
+        return wins, losses
+
+    def save(self):
+        """
+        Writes the counts next to the game log. The file is swapped in so it is never half written
+        :return:
+        """
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as matchup_file:
+            json.dump({
+                'log_signature': self.log_signature,
+                'head_to_head': self.head_to_head,
+                'mode_records': self.mode_records
+            }, matchup_file)
+        os.replace(temp_path, self.path)
+
+
+if __name__ == "__main__":
+    matchups = MatchupStats.load(os.curdir + "/resources/games.txt")
+    for own_name, opponents in sorted(matchups.head_to_head.items()):
+        for opp_name, (own_wins, own_losses) in sorted(opponents.items()):
+            print("%s vs %s: %i - %i" % (own_name, opp_name, own_wins, own_losses))
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+import game
+
+# Games waiting to be written. Queueing another game waits for the writer once this many are outstanding
+SAVE_QUEUE_SIZE = 64
+# Most games written with a single append and flush
+SAVE_BATCH_SIZE = 32
+# How often the main thread checks for finished writes
+SAVE_POLL_MS = 20
+
+
+class GameSaveQueue:
+    """
+    Records games to the game log on a background thread, so the Tk main thread never waits on the disk
+    Games queued while a write is in progress are written together with one append and one fsync.
+    The writer thread never touches Tk. Finished writes are put on a results queue that the main thread polls,
+    and the callbacks are run from there
+        after_write(games, signature_before, signature_after): optional, runs on the writer thread after each
+            successful write, for work derived from the log that shouldn't block the gui. Its result is passed on
+        on_saved(games, signature_before, signature_after, after_write_result): the log's fingerprint right before
+            and after the write, and what after_write returned, or None
+        on_failed(games, error)
+    """
+
+    def __init__(self, widget, game_log, on_saved, on_failed, after_write=None):
+        self.widget = widget
+        self.game_log = game_log
+        self.on_saved = on_saved
+        self.on_failed = on_failed
+        self.after_write = after_write
+
+        self.games = queue.Queue(maxsize=SAVE_QUEUE_SIZE)
+        self.results = queue.Queue()
+        # Games submitted whose result hasn't been handed to the main thread yet
+        self.in_flight = 0
+
+        self.thread = threading.Thread(target=self._write_loop, name="game log writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, game_obj):
+        """
+        Queues a game to be recorded
+        :param game_obj:
+        :return:
+        """
+        if not self.in_flight:
+            self.widget.after(SAVE_POLL_MS, self._poll)
+        self.in_flight += 1
+        self.games.put(game_obj)
+
+    def close(self):
+        """
+        Waits for every queued game to be written, then stops the writer
+        Results that haven't been polled are dropped. The games are on disk, and after_write has already run for them
+        :return:
+        """
+        self.games.put(None)
+        self.thread.join()
+
+    def _write_loop(self):
+        """
+        Runs on the writer thread. Takes everything that is queued, up to SAVE_BATCH_SIZE games, and records it at once
+        None on the queue stops the writer once the games in front of it are written
+        :return:
+        """
+        stopping = False
+        while not stopping:
+            batch = [self.games.get()]
+            while batch[-1] is not None and len(batch) < SAVE_BATCH_SIZE:
+                try:
+                    batch.append(self.games.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            if not batch:
+                continue
+
+            try:
+                signature_before = game.Game.log_signature(self.game_log)
+                game.Game.record_games(self.game_log, batch)
+                signature_after = game.Game.log_signature(self.game_log)
+            except Exception as e:
+                self.results.put((batch, None, None, None, e))
+                continue
+
+            # The games are saved even if the derived work fails
+            after_write_result = None
+            if self.after_write is not None:
+                try:
+                    after_write_result = self.after_write(batch, signature_before, signature_after)
+                except Exception as e:
+                    print("Failed to update after saving %i game(s): %s" % (len(batch), e))
+            self.results.put((batch, signature_before, signature_after, after_write_result, None))
+
+    def _poll(self):
+        """
+        Runs the callbacks of every finished write on the main thread
+        :return:
+        """
+        while True:
+            try:
+                batch, signature_before, signature_after, after_write_result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.in_flight -= len(batch)
+            if error is None:
+                self.on_saved(batch, signature_before, signature_after, after_write_result)
+            else:
+                self.on_failed(batch, error)
+
+        if self.in_flight:
+            self.widget.after(SAVE_POLL_MS, self._poll)
@@ -3,19 +3,48 @@ import game
 import tkinter as tk
 import os
 import time
-import re
-import game_mode_config
+import game_session
 import colors
 import stages
+import matchups
+import image_cache
+import sprite_atlas
+import character_search
+import manifest
+import save_queue
+import startup_profiler
+import latency
+import itertools
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
 
-from PIL import ImageTk, Image
 from tkinter import font
 
-character_image_folder = os.curdir + "/character_images"
-stage_image_folder = os.curdir + "/stage_images"
-stage_json = os.curdir + "/resources/stages.json"
 game_log = os.curdir + "/resources/games.txt"
 
+# Number of games loaded into the game history at a time
+HISTORY_PAGE_SIZE = 100
+
+# Worker threads used to decode images, and how often the main thread checks for finished decodes
+IMAGE_DECODE_WORKERS = 4
+IMAGE_POLL_MS = 10
+
+# Memory budget of the decoded images shared between widgets
+IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+CHARACTER_ICON_SIZE = (100, 100)
+STAGE_ICON_SIZE = (177, 100)
+
+# Bursts of resize events and search keystrokes closer together than this are handled with a single relayout
+RESIZE_DEBOUNCE_MS = 100
+SEARCH_DEBOUNCE_MS = 150
+
+# Layout of a character tile when the character grid is drawn directly on the canvas
+CANVAS_TILE_MARGIN = 15
+CANVAS_TILE_NAME_HEIGHT = 20
+CANVAS_TILE_BANNER_HEIGHT = 20
+
 
 # FONT_NORMAL = font.Font(family="Segoe UI", size=12)
 # FONT_BOLD = font.Font(family="Segoe UI Black")
@@ -51,11 +80,27 @@ class SmashGui(tk.Frame):
         Current Game Status
     """
 
-    def __init__(self, master=None):
+    def __init__(self, master=None, canvas_grid=False, profiler=None, latency_recorder=None,
+                 image_cache_bytes=IMAGE_CACHE_BYTES):
+        """
+        :param master:
+        :param canvas_grid: draw the character grid as items on the character canvas instead of a Frame per character
+        :param profiler: StartupProfiler that times each phase of startup. Startup isn't profiled if None
+        :param latency_recorder: LatencyRecorder that times user actions. Actions aren't timed if None
+        :param image_cache_bytes: memory budget of the decoded images shared between widgets
+        """
         super().__init__(master)
+        self.profiler = profiler or startup_profiler.StartupProfiler()
+        self.latency = latency_recorder or latency.LatencyRecorder(self)
+
+        with self.profiler.phase("font setup"):
+            default_font = font.Font(family="Segoe UI Semibold", size=10)
+            self.option_add("*Font", default_font)
 
-        default_font = font.Font(family="Segoe UI Semibold", size=10)
-        self.option_add("*Font", default_font)
+        # Characters, stages and image metadata all come from the compiled manifest in one read
+        with self.profiler.phase("resource manifest"):
+            self.resource_manifest = manifest.load_manifest()
+            characters.set_character_data(self.resource_manifest['characters'])
 
         # Sorting prereqs. sort_reverse_bit is the variable for the reverse checkbutton
         self.sort_group = SelectionButtonGroup()
@@ -63,13 +108,32 @@ class SmashGui(tk.Frame):
 
         # Variable will store all previously played Game objects
         self.game_history = []
+        # Fingerprint of the game log when game_history was last in sync with it
+        self.game_log_signature = None
+        # Win/loss counts shown in the overview frame
+        with self.profiler.phase("matchup stats"):
+            self.matchups = matchups.MatchupStats.load(game_log)
+        # Games are written on a background thread. They are shown in the history straight away,
+        # and are kept here until the write finishes in case they have to be taken back out
+        # The writer thread keeps its own copy of the matchup counts up to date and saved,
+        # and hands a new copy back after every write
+        self.save_queue = save_queue.GameSaveQueue(self, game_log, self._on_games_saved, self._on_games_failed,
+                                                   after_write=self.matchups.copy().update_after_write)
+        self.unsaved_games = []
 
         self.game_mode = 'sp'
         self.sort_mode = 'place'
-
-        # Holds the game handler class for the selected game mode
-        # This is the default value. To change, change this, and the self.game_mode above
-        self.game_handler = self.SinglePlayerHandler(self)
+        self.canvas_grid = canvas_grid
+
+        # One game handler per game mode. Each keeps its widgets for the whole session
+        # game_handler is the handler of the selected game mode
+        # This is the default value. To change, change self.game_mode above
+        self.game_handlers = {
+            'sp': self.SinglePlayerHandler(self),
+            'mp': self.MultiPlayerHandler(self),
+            'ffa': self.FreeForAllHandler(self)
+        }
+        self.game_handler = self.game_handlers[self.game_mode]
 
         # Tag to track who is currently selecting the character
         self.selection_mode = 'owner'
@@ -77,13 +141,34 @@ class SmashGui(tk.Frame):
 
         self.pack(fill='both', expand='yes')
 
+        # Images are decoded in the background. Widgets show a blank placeholder until theirs is ready
+        self.image_cache = image_cache.ImageCache(image_cache_bytes)
+        self.image_loader = BackgroundImageLoader(self, self.image_cache)
+        # Character placeholders are the size of the real icon, so nothing moves when it arrives. One per size
+        self.character_placeholders = {}
+        self.character_icon_size = SmashGui._largest_image_size(self.resource_manifest['character_images'].values(),
+                                                                CHARACTER_ICON_SIZE)
+        self.character_tile_size = CanvasCharacterTile.tile_size(self.character_icon_size)
+        self.stage_placeholder = tk.PhotoImage(width=STAGE_ICON_SIZE[0], height=STAGE_ICON_SIZE[1])
+
         self.master = master
         # Places all components within SmashGui
+        start_time = time.perf_counter()
         self._populate_interface()
+        print("Interface built in %.3f s" % (time.perf_counter() - start_time))
 
         self.game_selection_group.set(self.game_mode)
         self.sort_group.set(self.sort_mode)
-        self._sort_character_gui(SmashGui.NameSorter())
+        with self.profiler.phase("initial sort"):
+            self._sort_character_gui(SmashGui.NameSorter())
+
+        # The first idle callback runs once the window has been laid out and drawn
+        self.profiler.expect("first frame")
+        self.after_idle(lambda: self.profiler.complete("first frame"))
+        if self.image_loader.pending:
+            self.profiler.expect("image decode (background)")
+            self.image_loader.on_finished = lambda seconds: self.profiler.complete("image decode (background)",
+                                                                                   seconds)
 
     class GameHandler:
         """
@@ -92,16 +177,54 @@ class SmashGui(tk.Frame):
             Multi Player
             Free For All
         modes
+        The selections themselves are kept in a GameSession. The handler shows them in the widgets
         """
 
-        def __init__(self, smash_gui):
-            self.stage = "final_destination"
-            self.selection_turn = None
+        def __init__(self, smash_gui, mode):
+            self.session = game_session.GameSession(mode)
+            self.type = mode
             self.player_group = SelectionButtonGroup()
             self.smash_gui = smash_gui
-            self.character_tracker = {}
-            self.turn_index = 0
-            self.turn_keys = []
+            # Player key -> CharacterSelectedGui in the overview frame
+            self.overview_guis = {}
+            # Player key -> character tile the player selected
+            self.selected_tiles = {}
+            # Created by create_frames the first time this game mode is shown
+            self.character_overview_frame = None
+            self.player_frame = None
+
+        @property
+        def stage(self):
+            return self.session.stage
+
+        @property
+        def selection_turn(self):
+            return self.session.selection_turn
+
+        def create_frames(self, overview_master, player_master):
+            """
+            Creates this game mode's character overview and player indicator frames
+            They are kept and reset for every following game instead of being rebuilt
+            :param overview_master:
+            :param player_master:
+            :return:
+            """
+            self.character_overview_frame = tk.Frame(overview_master)
+            self.populate_overview_frame(self.character_overview_frame)
+            self.player_frame = tk.Frame(player_master)
+            self.populate_player_frame()
+
+        def reset(self):
+            """
+            Clears every player's character and stocks so the handler can be used for the next game
+            Only the character tiles that were selected have their banners removed
+            :return:
+            """
+            for key in self.session.reset():
+                self.selected_tiles.pop(key).deselect_character(key)
+            for gui in self.overview_guis.values():
+                gui.reset()
+            self.set_turn(self.session.selection_turn)
 
         def create_character_overview(self, tag, d, master):
             """
@@ -122,66 +245,58 @@ class SmashGui(tk.Frame):
             gui.set_color(character_data['color'])
             return gui
 
-        # abstract
+        def populate_overview_frame(self, character_overview_frame):
+            """
+            Method creates a current player selection frame for each player, in turn order
+            :param character_overview_frame:
+            :return:
+            """
+            for key in self.session.turn_keys:
+                self.overview_guis[key] = self.create_character_overview(key, self.session.players,
+                                                                         character_overview_frame)
+
         def select_character(self, character_gui):
             """
-            Saves the selected character to the handlers character/player data dictionary
+            Gives the selected character to the player whose turn it is and shows it in the player's displays
 
             :param character_gui:
             :return:
             """
-            current_data = self.character_tracker[self.selection_turn]
-            previous_character = current_data["character"]
+            key = self.session.selection_turn
+            previous_character = self.session.select_character(character_gui.character)
 
             # If the player had a character previously selected, deselect it first before selecting the new one
             if previous_character is not None:
                 print("Deselecting: " + str(previous_character))
-                current_data["character"] = None
-                current_data["gui"].clear()
-                current_data["ccg"].deselect_character(self.selection_turn)
+                self.overview_guis[key].clear()
+                self.selected_tiles.pop(key).deselect_character(key)
 
             # If the player selects their already selected character, then no processing needs to be done
             if previous_character != character_gui.character:
                 print("Selecting: " + str(character_gui.character))
-                current_data["character"] = character_gui.character
-                current_data["gui"].select_character(character_gui)
-                current_data["ccg"] = character_gui
-                character_gui.select_character(self.selection_turn, current_data["color"])
-                value = self.next_selection_turn()
+                self.overview_guis[key].select_character(character_gui)
+                self.selected_tiles[key] = character_gui
+                character_gui.select_character(key, self.session.players[key]["color"])
+                self.set_turn(self.session.selection_turn)
 
-                self.set_turn(value)
-
-        # abstract
         def ready_to_save(self):
             """
             Checks whether all necessary data is present in the dictionary to create a game object.
             :return: True or False
             """
-            for player in self.character_tracker.keys():
-                if self.character_tracker[player]["character"] is None or \
-                        self.character_tracker[player]["stocks"] is None:
-                    return False
-            return True
-
-        def next_selection_turn(self):
-            """
-            Sets the active players turn to the next player in the logical order
-            :return:
-            """
-            self.turn_index = (self.turn_index + 1) % len(self.turn_keys)
-            return self.turn_keys[self.turn_index]
+            return self.session.ready_to_save()
 
         def set_stock(self, tag, num):
             """
-            Updates the stock value for a specific player in the game dicitonary
+            Updates the stock value for a specific player in the game session
             :param tag: designates the player to set the stock value for
             :param num:
             :return:
             """
-            self.character_tracker[tag]["stocks"] = num
+            self.session.set_stock(tag, num)
 
         def set_stage(self, stage):
-            self.stage = stage
+            self.session.set_stage(stage)
 
         def populate_player_frame(self):
             """
@@ -189,12 +304,12 @@ class SmashGui(tk.Frame):
             :return:
             """
             self.player_group = SelectionButtonGroup()
-            frame = self.smash_gui.player_frame
+            frame = self.player_frame
 
             # Each loop creates a display for a specific character.
             # If it is clicked, it will switch to that player's turn
-            for key in self.turn_keys:
-                data = self.character_tracker[key]
+            for key in self.session.turn_keys:
+                data = self.session.players[key]
                 button = SelectionButtonGroup.SelectionButton(frame, self.player_group, value=key)
                 button.set_colors(abg=data["color"], afg=colors.SMASH_DARK, bg=colors.SMASH_NEUTRAL,
                                   fg=colors.SMASH_DARK)
@@ -202,7 +317,7 @@ class SmashGui(tk.Frame):
                 button.pack(side='left', fill='both')
 
             # Set the default player to the first one
-            self.player_group.set(self.turn_keys[0])
+            self.player_group.set(self.session.turn_keys[0])
 
         def set_turn(self, value):
             """
@@ -211,44 +326,34 @@ class SmashGui(tk.Frame):
             :param value:
             :return:
             """
-            self.selection_turn = value
-            self.turn_index = self.turn_keys.index(value)
-            self.player_group.set(self.selection_turn)
+            self.session.set_turn(value)
+            self.player_group.set(value)
 
         def update_overview_frame(self):
-            pass
-
-        def save_game(self):
             """
-            Takes the game dictionary and creates a Game object with it
-            Records the game in the game_log
+            Shows the record of each of the user's selected characters in this game mode
             :return:
             """
-            current_game = game.Game.from_dict(self.assemble_game_dict())
-            print("Created game: " + str(current_game))
-            current_game.record_game(game_log)
+            for key in self.session.turn_keys:
+                character = self.session.players[key]["character"]
+                if key.startswith("own") and character is not None:
+                    wins, losses = self.smash_gui.matchups.mode_record(self.type, character.name)
+                    self.overview_guis[key].set_record("%i W - %i L" % (wins, losses))
+                else:
+                    self.overview_guis[key].set_record("")
 
-        def assemble_game_dict(self):
+        def save_game(self):
             """
-            Takes the current game dictionary which has data assigned to user's of the gui and
-                transforms it into a dictionary structure that can be parsed into a Game Object
-            :return: game object dictionary structure
+            Creates a Game object from the current selections
+            Queues the game to be recorded in the game_log
+            :return: the Game object
             """
-            characters = []
-            stocks = []
-            for key in self.turn_keys:
-                characters.append(self.character_tracker[key]['character'])
-                stocks.append(self.character_tracker[key]['stocks'])
-            d = {
-                'time': time.time(),
-                'type': self.type,
-                'characters': characters,
-                'stocks': stocks,
-                'stage': self.stage
-            }
-
-            print("Game dict: " + str(d))
-            return d
+            game_dict = self.session.assemble_game_dict()
+            print("Game dict: " + str(game_dict))
+            current_game = game.Game.from_dict(game_dict)
+            print("Created game: " + str(current_game))
+            self.smash_gui.save_queue.submit(current_game)
+            return current_game
 
     class SinglePlayerHandler(GameHandler):
         """
@@ -258,27 +363,21 @@ class SmashGui(tk.Frame):
         """
 
         def __init__(self, smash_gui):
-            super().__init__(smash_gui)
-            self.selection_turn = "own"
-            self.type = 'sp'
-            self.turn_keys = ["own", "opp"]
+            super().__init__(smash_gui, 'sp')
             print("Initializing Single Player Handler")
 
-        def populate_overview_frame(self, character_overview_frame):
+        def update_overview_frame(self):
             """
-            Method creates 2 current player selection frames. One for each player
-            :param character_overview_frame:
+            Shows the head to head record of the two selected characters once both have been picked
             :return:
             """
-
-            self.character_tracker = game_mode_config.character_tracker[self.type]
-
-            self.character_tracker["own"]["gui"] = self.create_character_overview("own",
-                                                                                  self.character_tracker,
-                                                                                  character_overview_frame)
-            self.character_tracker["opp"]["gui"] = self.create_character_overview("opp",
-                                                                                  self.character_tracker,
-                                                                                  character_overview_frame)
+            own = self.session.players["own"]["character"]
+            opp = self.session.players["opp"]["character"]
+            if own is not None and opp is not None:
+                wins, losses = self.smash_gui.matchups.head_to_head_record(own.name, opp.name)
+                self.overview_guis["own"].set_record("%i W - %i L vs %s" % (wins, losses, opp.display_name))
+            else:
+                self.overview_guis["own"].set_record("")
 
     class MultiPlayerHandler(GameHandler):
         """
@@ -288,62 +387,19 @@ class SmashGui(tk.Frame):
         """
 
         def __init__(self, smash_gui):
-            super().__init__(smash_gui)
-            self.selection_turn = "own1"
-            self.type = 'mp'
-            self.turn_index = 0
-            self.turn_keys = ["own1", "own2", "opp1", "opp2"]
+            super().__init__(smash_gui, 'mp')
             print("Initializing Multi Player Handler")
 
-        def populate_overview_frame(self, character_overview_frame):
-            """
-            Method creates 4 current player selection frames. 2 for the users team and 2 for the opponents
-            :return:
-            """
-            self.character_tracker = game_mode_config.character_tracker[self.type]
-            self.character_tracker["own1"]["gui"] = self.create_character_overview("own1",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-            self.character_tracker["own2"]["gui"] = self.create_character_overview("own2",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-            self.character_tracker["opp1"]["gui"] = self.create_character_overview("opp1",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-            self.character_tracker["opp2"]["gui"] = self.create_character_overview("opp2",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-
     class FreeForAllHandler(GameHandler):
-        def __init__(self, smash_gui):
-            super().__init__(smash_gui)
-            self.selection_turn = "own"
-            self.type = 'ffa'
-            self.turn_index = 0
-            self.turn_keys = ["own", "opp1", "opp2", "opp3"]
-            print("Initializing Single Player Handler")
-
-            # abstract
+        """
+        Game Handler for free for all games
+        Tag = 'ffa'
+        players = "own", "opp1", "opp2", "opp3"
+        """
 
-        def populate_overview_frame(self, character_overview_frame):
-            """
-            Method creates 4 current player selection frames. the user and then 3 opponents
-            :param character_overview_frame:
-            :return:
-            """
-            self.character_tracker = game_mode_config.character_tracker[self.type]
-            self.character_tracker["own"]["gui"] = self.create_character_overview("own",
-                                                                                  self.character_tracker,
-                                                                                  character_overview_frame)
-            self.character_tracker["opp1"]["gui"] = self.create_character_overview("opp1",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-            self.character_tracker["opp2"]["gui"] = self.create_character_overview("opp2",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
-            self.character_tracker["opp3"]["gui"] = self.create_character_overview("opp3",
-                                                                                   self.character_tracker,
-                                                                                   character_overview_frame)
+        def __init__(self, smash_gui):
+            super().__init__(smash_gui, 'ffa')
+            print("Initializing Free For All Handler")
 
     class CharacterSelectedGui(tk.Frame):
         """
@@ -362,6 +418,7 @@ class SmashGui(tk.Frame):
             self.stock_group = SelectionButtonGroup()
             self.image_panel = tk.Label(self)
             self.character_label = tk.Label(self)
+            self.record_label = tk.Label(self)
             self.image_panel.grid(column=0, row=0, sticky='news')
 
             self.stock_frame = tk.Frame(self)
@@ -376,8 +433,9 @@ class SmashGui(tk.Frame):
             # Set the default number of stocks to 0
             self.stock_group.set(0)
 
-            self.stock_frame.grid(column=2, row=0, sticky='news')
+            self.stock_frame.grid(column=2, row=0, rowspan=2, sticky='news')
             self.character_label.grid(column=1, row=0, sticky='news')
+            self.record_label.grid(column=0, row=1, columnspan=2, sticky='news')
             self.grid_rowconfigure(0, weight=1)
             self.grid_columnconfigure(0, weight=1)
             self.grid_columnconfigure(1, weight=1)
@@ -389,8 +447,8 @@ class SmashGui(tk.Frame):
             :return:
             """
             self.character_gui = character
-            self.image_panel.configure(image=self.character_gui.img)
-            self.character_label.configure(text=self.character_gui.character.display_name)
+            configure_changed(self.image_panel, image=self.character_gui.img)
+            configure_changed(self.character_label, text=self.character_gui.character.display_name)
             self.image_panel.grid(column=0, row=0, sticky='news')
 
         def clear(self):
@@ -399,23 +457,47 @@ class SmashGui(tk.Frame):
             :return:
             """
             self.character_gui = None
-            self.image_panel.configure(image='')
-            self.character_label.configure(text='')
+            configure_changed(self.image_panel, image='')
+            configure_changed(self.character_label, text='')
             self.image_panel.grid_forget()
 
+        def update_image(self):
+            """
+            Shows the current image of the selected character, once it has replaced the placeholder
+            :return:
+            """
+            if self.character_gui is not None:
+                configure_changed(self.image_panel, image=self.character_gui.img)
+
+        def reset(self):
+            """
+            Clears the character, record and stocks so the display can be used for the next game
+            :return:
+            """
+            self.clear()
+            self.set_record("")
+            self.stock_group.set(0)
+
+        def set_record(self, text):
+            """
+            Shows the win/loss record for the selected character
+            :param text:
+            :return:
+            """
+            configure_changed(self.record_label, text=text)
+
         def set_color(self, color):
             """
             Sets the color theme for the frane and it's children
             :param color:
             :return:
             """
-            self.configure(bg=color)
-            for child in self.winfo_children():
-                child.configure(bg=color)
+            configure_changed(self, bg=color)
+            for child in (self.image_panel, self.character_label, self.record_label, self.stock_frame):
+                configure_changed(child, bg=color)
 
-            for child in self.stock_frame.winfo_children():
-                child.set_colors(abg='black', afg=color, bg=color, fg='black')
-                child.configure(bg=color)
+            for stock_button in self.stock_group.button_list:
+                stock_button.set_colors(abg='black', afg=color, bg=color, fg='black')
             self.stock_group.update()
 
         def set_stock(self, num):
@@ -434,10 +516,13 @@ class SmashGui(tk.Frame):
             self.stage = stage
             self.smash_gui = smash_gui
 
-            self.image_frame = ImageTk.PhotoImage(
-                Image.open(stage_image_folder + "/" + self.stage.image).resize((177, 100)))
+            # Filled in by set_image once the stage image has been decoded
+            self.image_frame = smash_gui.stage_placeholder
+            self.image_labels = []
             self._create_on_state()
             self._create_off_state()
+            smash_gui.image_loader.load(smash_gui.resource_manifest['stage_images'][self.stage.image]['path'],
+                                        STAGE_ICON_SIZE, self.set_image)
 
             for child in master.winfo_children():
                 child.bind("<Button-1>", lambda e: self._set_stage(e))
@@ -447,6 +532,7 @@ class SmashGui(tk.Frame):
                                      highlightbackground=colors.SMASH_DARK)
             image = tk.Label(self.on_frame, image=self.image_frame)
             image.image = self.image_frame
+            self.image_labels.append(image)
             name = tk.Label(self.on_frame, text=self.stage.display_name)
             name.pack(expand='yes', fill='x', anchor='s')
             image.pack(expand='yes', fill='both')
@@ -457,6 +543,7 @@ class SmashGui(tk.Frame):
             self.off_frame = tk.Frame(self.master)
             image = tk.Label(self.off_frame, image=self.image_frame)
             image.image = self.image_frame
+            self.image_labels.append(image)
             name = tk.Label(self.off_frame, text=self.stage.display_name)
             name.pack(expand='yes', fill='x', anchor='s')
             image.pack(expand='yes', fill='both')
@@ -464,6 +551,17 @@ class SmashGui(tk.Frame):
             for child in self.off_frame.winfo_children():
                 child.bind("<Button-1>", lambda e: self._set_stage(e))
 
+        def set_image(self, image):
+            """
+            Replaces the placeholder in both the on and off state with the decoded stage image
+            :param image: PhotoImage
+            :return:
+            """
+            self.image_frame = image
+            for label in self.image_labels:
+                label.configure(image=image)
+                label.image = image
+
         def _set_stage(self, event):
             self.smash_gui.set_stage(self.stage.name)
 
@@ -474,26 +572,31 @@ class SmashGui(tk.Frame):
         """
 
         # Character Frame
-        self.character_frame = tk.Frame(self)
-        self.character_canvas = tk.Canvas(self.character_frame)
-        self.character_canvas.pack(side='left', fill='both', expand='yes')
-        self._populate_character_frame()
+        with self.profiler.phase("character frame"):
+            self.character_frame = tk.Frame(self)
+            self.character_canvas = tk.Canvas(self.character_frame)
+            self.character_canvas.pack(side='left', fill='both', expand='yes')
+            self._populate_character_frame()
 
         # Stage Frame
-        self.stage_frame = tk.Frame(self)
-        self._populate_stage_frame()
+        with self.profiler.phase("stage frame"):
+            self.stage_frame = tk.Frame(self)
+            self._populate_stage_frame()
 
         # Overview Frame
-        self.overview_frame = tk.Frame(self, bg='red', height=400)
-        self._populate_overview_frame()
+        with self.profiler.phase("overview frame"):
+            self.overview_frame = tk.Frame(self, bg='red', height=400)
+            self._populate_overview_frame()
 
         # Game Player Frame
-        self.game_player_frame = tk.Frame(self)
-        self._populate_game_player_frame()
+        with self.profiler.phase("game player frame"):
+            self.game_player_frame = tk.Frame(self)
+            self._populate_game_player_frame()
 
         # Game History Frame
-        self.game_log_frame = tk.Frame(self)
-        self._populate_game_log_frame()
+        with self.profiler.phase("game history"):
+            self.game_log_frame = tk.Frame(self)
+            self._populate_game_log_frame()
 
         self.game_player_frame.grid(row=0, column=0, sticky='news')
         self.character_frame.grid(row=1, column=0, sticky='news')
@@ -513,42 +616,124 @@ class SmashGui(tk.Frame):
         Creates the icon frame and adds scrolling function with canvas
         """
         self.recommended_cols = 10
-
-        # Create the frame that lives inside of the character canvas
-        self.character_icon_frame = tk.Frame(self.character_canvas)
-        self.character_icon_frame.pack(fill='both', expand='yes')
-        self.character_icon_frame.bind("<Configure>",
-                                       lambda e: self.character_canvas.configure(
-                                           scrollregion=self.character_canvas.bbox("all")
-                                       )
-                                       )
+        # Number of columns the character guis are currently placed in, and the (row, col) of each displayed gui
+        self.layout_cols = 0
+        self.character_gui_positions = {}
 
         # Create Scrollbar and attach it to canvas
         self.character_icon_scroll = tk.Scrollbar(self.character_frame)
         self.character_icon_scroll.configure(command=self.character_canvas.yview)
         self.character_icon_scroll.pack(side="right", fill='y')
-
-        # Configure canvas to house/display inner frame correctly.
-        # Configure canvas to work with scrollbar
-        self.character_canvas.create_window((0, 0), window=self.character_icon_frame, anchor="nw")
         self.character_canvas.configure(yscrollcommand=self.character_icon_scroll.set)
-        self.character_canvas.bind("<Configure>", self._configure_grid_params)
+        self.resize_debouncer = Debouncer(self, RESIZE_DEBOUNCE_MS, self._configure_grid_params, "Resize")
+        self.character_canvas.bind("<Configure>", self.resize_debouncer)
         self.character_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
 
         self.character_guis = []
         characters_data = characters.character_data()
-
-        # From all the characters, create a CharacterGui object for each one
-        for character in characters_data.values():
-            gui = CharacterGui(character, self.character_icon_frame, self)
-            self.character_guis.append(gui)
-
-        # Start off by having all guis able to be displayed
+        self.character_search = character_search.CharacterSearchIndex(characters_data,
+                                                                      character_search.load_aliases())
+
+        if self.canvas_grid:
+            # Every character is drawn on the canvas. One binding on the canvas handles all clicks
+            self.character_canvas.bind("<Button-1>", self._on_character_canvas_click)
+            for character in characters_data.values():
+                self.character_guis.append(CanvasCharacterTile(character, self.character_canvas, self))
+        else:
+            # Create the frame that lives inside of the character canvas
+            self.character_icon_frame = tk.Frame(self.character_canvas)
+            self.character_icon_frame.pack(fill='both', expand='yes')
+            self.character_icon_frame.bind("<Configure>",
+                                           lambda e: self.character_canvas.configure(
+                                               scrollregion=self.character_canvas.bbox("all")
+                                           )
+                                           )
+
+            # Configure canvas to house/display inner frame correctly.
+            self.character_canvas.create_window((0, 0), window=self.character_icon_frame, anchor="nw")
+
+            # From all the characters, create a CharacterGui object for each one
+            for character in characters_data.values():
+                gui = CharacterGui(character, self.character_icon_frame, self)
+                self.character_guis.append(gui)
+
+        self._load_character_icons()
+
+        # Every sort order is computed once. Sorting, reversing and searching only pick from these lists
+        self.character_sort_orders = {}
+        for sorter in [SmashGui.NameSorter, SmashGui.PlacementSorter, SmashGui.GameSorter]:
+            self.character_sort_orders[sorter.tag] = sorted(self.character_guis, key=sorter.compare)
+
+        # Start off by having all guis able to be displayed. None means there is no active search
         self.displayable_character_guis = self.character_guis
+        self.search_matches = None
 
         # Default sorting value
         self._sort_character_gui(SmashGui.PlacementSorter())
 
+    def _load_character_icons(self):
+        """
+        Starts loading the icon of every character gui in the background
+        If the character atlas is up to date, it is decoded once and every icon is cut out of it.
+        Otherwise each icon is loaded from its own image
+        :return:
+        """
+        callbacks = {}
+        for gui in self.character_guis:
+            callbacks.setdefault(gui.character.image, []).append(gui.set_image)
+
+        # The manifest has already checked every icon's stamp, so the atlas is validated against it
+        stamps = {image: self.resource_manifest['character_images'][image]['stamp'] for image in callbacks}
+        rects = sprite_atlas.load_index(callbacks.keys(), source_stamps=stamps)
+        if rects is not None:
+            self.image_loader.load_atlas(rects, callbacks)
+        else:
+            for image, image_callbacks in callbacks.items():
+                for callback in image_callbacks:
+                    self.image_loader.load(self.resource_manifest['character_images'][image]['path'], None,
+                                           callback)
+
+    def character_placeholder(self, character):
+        """
+        Returns a blank image the size of a character's icon, from the image sizes in the resource manifest
+        :param character:
+        :return: PhotoImage shared by every character with the same icon size
+        """
+        size = self.resource_manifest['character_images'][character.image]['size'] or CHARACTER_ICON_SIZE
+        if size not in self.character_placeholders:
+            self.character_placeholders[size] = tk.PhotoImage(width=size[0], height=size[1])
+        return self.character_placeholders[size]
+
+    @staticmethod
+    def _largest_image_size(images, default):
+        """
+        :param images: image metadata from the resource manifest
+        :param default: size used if no image has a known size
+        :return: (width, height) big enough for every image
+        """
+        sizes = [image['size'] for image in images if image['size'] is not None]
+        if not sizes:
+            return default
+        return max(size[0] for size in sizes), max(size[1] for size in sizes)
+
+    def _on_character_canvas_click(self, event):
+        """
+        Maps a click on the canvas drawn character grid to the character under it
+        Tiles sit in a regular grid, so the row and column come straight from the click position
+        :param event:
+        :return:
+        """
+        x = self.character_canvas.canvasx(event.x)
+        y = self.character_canvas.canvasy(event.y)
+        col = int(x // self.character_tile_size[0])
+        row = int(y // self.character_tile_size[1])
+        if x < 0 or y < 0 or col >= self.layout_cols:
+            return
+
+        index = row * self.layout_cols + col
+        if index < len(self.displayable_character_guis):
+            self.select_character(self.displayable_character_guis[index])
+
     def _on_mousewheel(self, event):
         """
         Given a mouse wheel event, scroll the canvas acccordingly
@@ -561,17 +746,19 @@ class SmashGui(tk.Frame):
         """
         Method determines the recommended number of columns for the character grid
         This value is based on the individual width of each character and the overall width of the canvas
-        Triggered on window resize event
+        Triggered on window resize event, once a burst of resize events has settled
         If the calculated number of columns isnt equal to the current one, reconfigure grid to calculated number
         :param event:
         :return:
         """
-        gui_width = self.character_guis[0].winfo_width()
-        current_cols = self.character_icon_frame.grid_size()[0]
+        if self.canvas_grid:
+            gui_width = self.character_tile_size[0]
+        else:
+            gui_width = self.character_guis[0].winfo_width()
         canvas_width = event.width
-        self.recommended_cols = int(canvas_width / gui_width)
+        self.recommended_cols = max(1, int(canvas_width / gui_width))
 
-        if self.recommended_cols != current_cols:
+        if self.recommended_cols != self.layout_cols:
             print("Updating character columns to " + str(self.recommended_cols))
             self._replace_character_guis()
 
@@ -579,24 +766,43 @@ class SmashGui(tk.Frame):
         """
         When refreshing character guis
         Used for searching, sorting, reconfiguring grid size
+        Only guis that appear, disappear or move to a different cell are touched
         :return:
         """
-        print("Replacing all character guis")
-        # Remove ALL character guis from frame
-        for gui in self.character_guis:
-            gui.grid_forget()
-
-        # Add the displayable guis back
+        new_positions = {}
         for c, gui in enumerate(self.displayable_character_guis):
             row = int(c / self.recommended_cols)
             col = int(c % self.recommended_cols)
-
-            gui.grid(column=col, row=row)
-            # self.character_icon_frame.grid_columnconfigure(col, weight=1)
+            new_positions[gui] = (row, col)
+
+        # Remove the guis that are no longer displayed
+        removed = 0
+        for gui in self.character_gui_positions:
+            if gui not in new_positions:
+                gui.grid_forget()
+                removed += 1
+
+        # Place the guis that are new or have moved
+        placed = 0
+        for gui, (row, col) in new_positions.items():
+            if self.character_gui_positions.get(gui) != (row, col):
+                gui.grid(column=col, row=row)
+                placed += 1
+
+        self.character_gui_positions = new_positions
+        print("Regridded character guis: %i placed, %i removed, %i unchanged" % (
+            placed, removed, len(new_positions) - placed))
+
+        self.layout_cols = self.recommended_cols
+        if self.canvas_grid:
+            rows = -(-len(self.displayable_character_guis) // self.layout_cols)
+            self.character_canvas.configure(scrollregion=(0, 0, self.layout_cols * self.character_tile_size[0],
+                                                          rows * self.character_tile_size[1]))
 
     def _sort_character_gui(self, sorting_comparator=None):
         """
         Sorts the character grid by the sorting_comparator passed in
+        Uses the order computed for the comparator at startup. Reversing walks that order backwards
         :param sorting_comparator: Abstract class that contains compare method.
         :return:
         """
@@ -605,33 +811,60 @@ class SmashGui(tk.Frame):
         rev = bool(self.sort_reverse_bit.get())
         print("Sorting characters by: " + sorting_comparator.tag + " " + str(rev))
 
-        self.displayable_character_guis = sorted(self.displayable_character_guis, key=sorting_comparator.compare,
-                                                 reverse=rev)
-
-        self._replace_character_guis()
+        self.current_sorting_comparator = sorting_comparator
+        self._apply_character_order()
         self.sort_group.set(sorting_comparator.tag)
         self.sort_mode = sorting_comparator.tag
-        self.current_sorting_comparator = sorting_comparator
 
-    def _search_character_gui(self, expr=''):
+    def _apply_character_order(self):
         """
-        Updates the list of character guis that should be displayed based on the search term provided
-        :param expr:
+        Builds the displayable character guis from the active sort order, keeping only the current search matches
         :return:
         """
-        # If nothing is specified. Display all
-        if expr == '':
-            self.displayable_character_guis = self.character_guis
+        order = self.character_sort_orders[self.current_sorting_comparator.tag]
+        if self.sort_reverse_bit.get():
+            order = reversed(order)
+
+        if self.search_matches is None:
+            self.displayable_character_guis = list(order)
         else:
-            print("Search for characters with %s" % expr)
-            pattern = re.escape(expr)
-            self.displayable_character_guis = []
-            for character_gui in self.character_guis:
-                if re.search(pattern, character_gui.character.name, re.I):
-                    self.displayable_character_guis.append(character_gui)
+            self.displayable_character_guis = [gui for gui in order if gui.character.name in self.search_matches]
 
         self._replace_character_guis()
 
+    def _on_search_key(self, expr):
+        """
+        Validate command of the search bar. Runs on every key press
+        The search itself is debounced so typing quickly only searches once
+        The time of the key press is passed along, so the search latency includes the debounce delay
+        :param expr: contents of the search bar after the key press
+        :return: True so the key press is accepted
+        """
+        self.search_debouncer(expr, time.perf_counter())
+        return True
+
+    def _search_character_gui(self, expr='', key_time=None):
+        """
+        Updates the list of character guis that should be displayed based on the search term provided
+        Matches the name, display name, game series and aliases of each character through the search index
+        Records "search" from the last key press to the redraw, as the user sees it,
+        and "search handler" for the search and relayout alone
+        :param expr:
+        :param key_time: time.perf_counter() of the last key press. Defaults to now
+        :return:
+        """
+        with self.latency.measure("search", start_time=key_time), self.latency.measure("search handler"):
+            # If nothing is specified. Display all
+            if expr == '':
+                self.search_matches = None
+                self.character_search.search(expr)
+            else:
+                print("Search for characters with %s" % expr)
+                self.search_matches = self.character_search.search(expr)
+
+            # Keeps the active sort order
+            self._apply_character_order()
+
         # Return true for validate command
         return True
 
@@ -662,7 +895,7 @@ class SmashGui(tk.Frame):
     def _populate_stage_frame(self):
         self.stage_group = SelectionButtonGroup()
         stage_order = ['battlefield', 'final_destination', 'small_battlefield', 'other']
-        stage_dict = stages.Stage.get_stages(stage_json)
+        stage_dict = stages.Stage.from_data(self.resource_manifest['stages'])
 
         for stage_tag in stage_order:
             selection_gui = SelectionButtonGroup.SelectionFrame(self.stage_frame, self.stage_group, value=stage_tag)
@@ -675,15 +908,11 @@ class SmashGui(tk.Frame):
 
     def _populate_overview_frame(self):
         """
-        Tells game handler to create all player selection guis within overview frame
-        Then creates Save button
+        Creates Save button
+        The player selection guis of the game mode are placed in column 0 by _show_game_handler_frames
         :return:
         """
 
-        self.character_overview_frame = tk.Frame(self.overview_frame)
-        self.game_handler.populate_overview_frame(self.character_overview_frame)
-        self.character_overview_frame.grid(column=0, row=0, sticky='news')
-
         self.save_game_button = tk.Button(self.overview_frame, text="Save", bg="#66ff66", fg="white", state="disabled",
                                           command=self.save_game)
         self.save_game_button.grid(column=1, row=0, sticky='news')
@@ -693,7 +922,9 @@ class SmashGui(tk.Frame):
         self.overview_frame.grid_rowconfigure(0, weight=1)
 
     def _populate_game_player_frame(self):
-        self._populate_player_frame()
+        # The overview frame already exists, so the game handler can place its widgets in both
+        self._show_game_handler_frames()
+        self.game_player_frame.grid_columnconfigure(3, weight=1)
         self._populate_search_frame()
         self._populate_sort_frame()
         self._populate_game_selection_frame()
@@ -703,23 +934,25 @@ class SmashGui(tk.Frame):
     def _update_overview_frame(self):
         """
         Sets the state of the save button if the game is or isnt ready to be saved
+        Updates the records shown for the selected characters
         :return:
         """
         if self.game_handler.ready_to_save():
-            self.save_game_button.configure(state="normal")
+            configure_changed(self.save_game_button, state="normal")
         else:
-            self.save_game_button.configure(state="disabled")
+            configure_changed(self.save_game_button, state="disabled")
+        self.game_handler.update_overview_frame()
 
-    def _populate_player_frame(self):
+    def _show_game_handler_frames(self):
         """
-        Creates the player frame
-        Tells game handler to create the player indicators.
+        Shows the player selection guis and player indicators of the current game handler
+        They are created the first time the game mode is shown. After that the hidden frames are placed back
         :return:
         """
-        self.player_frame = tk.Frame(self.game_player_frame)
-        self.game_handler.populate_player_frame()
-        self.player_frame.grid(column=3, row=0, sticky='w')
-        self.game_player_frame.grid_columnconfigure(3, weight=1)
+        if self.game_handler.character_overview_frame is None:
+            self.game_handler.create_frames(self.overview_frame, self.game_player_frame)
+        self.game_handler.character_overview_frame.grid(column=0, row=0, sticky='news')
+        self.game_handler.player_frame.grid(column=3, row=0, sticky='w')
 
     def _populate_search_frame(self):
         """
@@ -727,7 +960,8 @@ class SmashGui(tk.Frame):
         :return:
         """
         self.search_frame = tk.Frame(self.game_player_frame)
-        vcmd = self.register(self._search_character_gui)
+        self.search_debouncer = Debouncer(self, SEARCH_DEBOUNCE_MS, self._search_character_gui, "Search")
+        vcmd = self.register(self._on_search_key)
         self.search_bar = tk.Entry(self.search_frame, vcmd=(vcmd, '%P'), validate='key')
         self.search_bar.pack(fill='both', expand='yes')
         self.search_frame.grid(column=1, row=0, sticky='ew')
@@ -796,52 +1030,56 @@ class SmashGui(tk.Frame):
         Creates the list of previous games player
         :return:
         """
-        self.game_history_box = tk.Listbox(self.game_log_frame)
-        self.game_history_box.pack(fill='both', expand='yes')
+        self.game_history_view = GameHistoryView(self.game_log_frame)
+        self.game_history_view.pack(fill='both', expand='yes')
+        self.game_history = self.game_history_view.games
         self._update_game_history()
 
     def _update_game_history(self):
         """
-        Reads the entire game history from the game_log
-        Updates the game history display with these games
+        Restarts the game history display from the newest game in the game_log
+        Only the first page of games is read. The rest is read as the history is scrolled
         :return:
         """
-        new_game_history = game.Game.load_all_games_sorted(game_log, True)
-        self.game_history_box.delete(0, len(self.game_history) - 1)
-        for new_game in new_game_history:
-            self.game_history_box.insert(self.game_history_box.size(), new_game)
+        self.game_log_signature = game.Game.log_signature(game_log)
+        self.game_history_view.reset(game.Game.iter_games(game_log, rev=True))
+        for unsaved_game in self.unsaved_games:
+            self.game_history_view.add_game(unsaved_game)
 
-        self.game_history = new_game_history
+    def _add_game_to_history(self, new_game):
+        """
+        Inserts a single game into the game history display without reloading the game log
+        :param new_game:
+        :return:
+        """
+        self.game_history_view.add_game(new_game)
 
     def change_game_mode(self, mode):
         """
         Swaps between the game modes.
-        Creates a new GameHandler
-        Then destroys affected widgets and repopulates them
+        Clears the selections of the current game handler. If the mode changed, its widgets are hidden
+        and the new mode's handler and widgets are shown in their place
         :param mode:
         :return:
         """
-        if mode == "sp" and self.game_mode != "sp":
-            self.game_handler = SmashGui.SinglePlayerHandler(self)
-            self.game_selection_group.set("sp")
-        if mode == "mp" and self.game_mode != "mp":
-            self.game_handler = SmashGui.MultiPlayerHandler(self)
-            self.game_selection_group.set("mp")
-        if mode == "ffa" and self.game_mode != "ffa":
-            self.game_handler = SmashGui.FreeForAllHandler(self)
-            self.game_selection_group.set("ffa")
-        self.character_overview_frame.destroy()
-        self.player_frame.destroy()
-
-        [gui.deselect_character("all") for gui in self.character_guis]
-
-        self._populate_overview_frame()
-        self._populate_player_frame()
+        previous_handler = self.game_handler
+        previous_handler.reset()
+
+        if mode != self.game_mode:
+            previous_handler.character_overview_frame.grid_remove()
+            previous_handler.player_frame.grid_remove()
+            self.game_mode = mode
+            self.game_handler = self.game_handlers[mode]
+            self.game_handler.set_stage(previous_handler.stage)
+            self._show_game_handler_frames()
+
+        self.game_selection_group.set(mode)
+        self._update_overview_frame()
 
     def clear(self):
         """
         Clears all selections. Sets the game mode to itself.
-        Then method destroys and resets everything. Then repoulates same gamemode
+        The widgets of the game mode are kept and reset in place
         :return:
         """
         self.change_game_mode(self.game_selection_group.get())
@@ -850,25 +1088,75 @@ class SmashGui(tk.Frame):
         """
         Received from save game button. Initiates game handler save.
         Then clears the selections so that gui is ready for next use
-        Updates game history. Basically just adds this new game to the list
+        The game is written in the background. It is added to the game history straight away
+        and taken back out if the write fails
         :return:
         """
-        self.game_handler.save_game()
-        self.clear()
-        self._update_game_history()
+        with self.latency.measure("save_game"):
+            saved_game = self.game_handler.save_game()
+            self.unsaved_games.append(saved_game)
+            self.clear()
+            self._add_game_to_history(saved_game)
+
+    def _on_games_saved(self, saved_games, signature_before, signature_after, matchup_stats):
+        """
+        Called once games have been written to the game log
+        The game history is only reloaded if something else changed the log since it was last read
+        :param saved_games:
+        :param signature_before: fingerprint of the game log right before the games were written
+        :param signature_after: fingerprint of the game log right after the games were written
+        :param matchup_stats: MatchupStats counted and saved by the writer thread, or None if that failed
+        :return:
+        """
+        self.unsaved_games = [g for g in self.unsaved_games if all(g is not s for s in saved_games)]
+        if matchup_stats is not None:
+            self.matchups = matchup_stats
+
+        if signature_before != self.game_log_signature:
+            print("Game log was changed outside of the gui. Reloading game history")
+            self._update_game_history()
+        else:
+            self.game_log_signature = signature_after
+
+    def _on_games_failed(self, failed_games, error):
+        """
+        Called when games could not be written to the game log. Takes them back out of the game history
+        :param failed_games:
+        :param error:
+        :return:
+        """
+        print("Failed to save %i game(s): %s" % (len(failed_games), error))
+        for failed_game in failed_games:
+            self.unsaved_games = [g for g in self.unsaved_games if g is not failed_game]
+            self.game_history_view.remove_game(failed_game)
 
     def set_stock(self, tag, num):
-        self.game_handler.set_stock(tag, num)
-        self._update_overview_frame()
+        with self.latency.measure("set_stock"):
+            self.game_handler.set_stock(tag, num)
+            self._update_overview_frame()
 
     def set_stage(self, stage):
-        print("SmashGui: set_stage: Setting stage to: " + str(stage))
-        self.game_handler.set_stage(stage)
-        self.stage_group.set(stage)
+        with self.latency.measure("set_stage"):
+            print("SmashGui: set_stage: Setting stage to: " + str(stage))
+            self.game_handler.set_stage(stage)
+            self.stage_group.set(stage)
+
+    def update_selected_character_image(self, character_gui):
+        """
+        Called when a character's icon has been decoded. Player selection guis that were showing
+        the placeholder of that character are updated too
+        :param character_gui:
+        :return:
+        """
+        for handler in self.game_handlers.values():
+            for overview_gui in handler.overview_guis.values():
+                if overview_gui.character_gui is character_gui:
+                    overview_gui.update_image()
 
     def select_character(self, character_gui):
-        self.game_handler.select_character(character_gui)
-        self._update_overview_frame()
+        with self.latency.measure("select_character"):
+            self.game_handler.select_character(character_gui)
+            self._update_overview_frame()
 
 
 class CharacterGui(tk.Frame):
@@ -889,8 +1177,8 @@ class CharacterGui(tk.Frame):
         self.smash_gui = smash_gui
         self.character = character
 
-        # Image configuration
-        self.img = self.character_icon()
+        # Image configuration. The placeholder is replaced by set_image once the icon has been decoded
+        self.img = smash_gui.character_placeholder(character)
         self.image_panel = tk.Label(self, image=self.img)
         self.image_panel.pack(padx=margins, pady=[margins, 0], fill='both', expand='yes')
 
@@ -935,26 +1223,407 @@ class CharacterGui(tk.Frame):
             if tag in self.banner_dict:
                 self.banner_dict.pop(tag).destroy()
 
-    def character_icon(self):
-        return ImageTk.PhotoImage(Image.open(character_image_folder + "/" + self.character.image))
+    def set_image(self, image):
+        """
+        Replaces the placeholder with the decoded character icon
+        :param image: PhotoImage
+        :return:
+        """
+        self.img = image
+        self.image_panel.configure(image=image)
+        self.smash_gui.update_selected_character_image(self)
+
+
+class Debouncer:
+    """
+    Collapses a burst of calls into a single call once no new call has come in for delay_ms
+    Only the arguments of the last call are used. Built on after(), so the function always runs on the Tk main thread
+    Counts how many calls came in and how many times the function actually ran
+    """
+
+    def __init__(self, widget, delay_ms, function, name):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        self.function = function
+        self.name = name
+        self.after_id = None
+        self.args = ()
+        self.requests = 0
+        self.runs = 0
+
+    def __call__(self, *args):
+        self.requests += 1
+        self.args = args
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+        self.after_id = self.widget.after(self.delay_ms, self._run)
+
+    def avoided(self):
+        """
+        :return: number of calls that were collapsed into another call
+        """
+        return self.requests - self.runs
+
+    def _run(self):
+        self.after_id = None
+        self.runs += 1
+        print("%s: %i runs for %i events, %i avoided" % (self.name, self.runs, self.requests, self.avoided()))
+        self.function(*self.args)
+
+
+class CanvasCharacterTile:
+    """
+    Character selection tile drawn as items on the character canvas instead of a Frame holding Labels
+    Has the same interface as CharacterGui, so the game handlers and the grid layout can use either.
+    All items of a tile share a canvas tag, so moving, showing and hiding a tile is a single canvas call
+    Every tile is the same size, with room for the largest character icon
+    """
+
+    def __init__(self, character, canvas, smash_gui):
+        self.character = character
+        self.canvas = canvas
+        self.smash_gui = smash_gui
+        self.banner_dict = {}
+        self.icon_size = smash_gui.character_icon_size
+        self.width, self.height = smash_gui.character_tile_size
+
+        # Tiles are created hidden at the origin and moved into place by grid
+        self.tag = "character_tile_" + character.name
+        self.banner_tag = self.tag + "_banner"
+        self.x = 0
+        self.y = 0
+        self.visible = False
+
+        self.img = smash_gui.character_placeholder(character)
+        self.image_item = canvas.create_image(self.width // 2, CANVAS_TILE_MARGIN, image=self.img, anchor='n',
+                                              tags=(self.tag,), state='hidden')
+        canvas.create_text(self.width // 2, CANVAS_TILE_MARGIN + self.icon_size[1] + CANVAS_TILE_NAME_HEIGHT // 2,
+                           text=character.display_name, tags=(self.tag,), state='hidden')
+
+    @staticmethod
+    def tile_size(icon_size):
+        """
+        :param icon_size: (width, height) of the largest character icon
+        :return: (width, height) of a tile
+        """
+        return (icon_size[0] + 2 * CANVAS_TILE_MARGIN,
+                icon_size[1] + CANVAS_TILE_NAME_HEIGHT + CANVAS_TILE_BANNER_HEIGHT + 2 * CANVAS_TILE_MARGIN)
+
+    def set_image(self, image):
+        """
+        Replaces the placeholder with the decoded character icon
+        :param image: PhotoImage
+        :return:
+        """
+        self.img = image
+        self.canvas.itemconfigure(self.image_item, image=image)
+        self.smash_gui.update_selected_character_image(self)
+
+    def grid(self, column, row):
+        """
+        Moves the tile to a cell of the character grid and shows it
+        :param column:
+        :param row:
+        :return:
+        """
+        x = column * self.width
+        y = row * self.height
+        if x != self.x or y != self.y:
+            self.canvas.move(self.tag, x - self.x, y - self.y)
+            self.x = x
+            self.y = y
+        if not self.visible:
+            self.canvas.itemconfigure(self.tag, state='normal')
+            self.visible = True
+
+    def grid_forget(self):
+        """
+        Hides the tile. It keeps its position until it is placed again
+        :return:
+        """
+        if self.visible:
+            self.canvas.itemconfigure(self.tag, state='hidden')
+            self.visible = False
+
+    def select_character(self, tag, color):
+        """
+        Comes from smash_gui game handler
+        Adds a player's banner under the character
+        """
+        print("Adding " + str(color) + " banner to " + str(self.character))
+        self.banner_dict[tag] = color
+        self._draw_banners()
+
+    def deselect_character(self, tag):
+        """
+        Removes a player's banner, or all of them
+        """
+        if tag == "all":
+            self.banner_dict = {}
+        else:
+            self.banner_dict.pop(tag, None)
+        self._draw_banners()
+
+    def _draw_banners(self):
+        """
+        Redraws the banners side by side, splitting the width of the tile between them
+        :return:
+        """
+        self.canvas.delete(self.banner_tag)
+        if not self.banner_dict:
+            return
+
+        left = self.x + CANVAS_TILE_MARGIN
+        top = self.y + CANVAS_TILE_MARGIN + self.icon_size[1] + CANVAS_TILE_NAME_HEIGHT
+        banner_width = self.icon_size[0] / len(self.banner_dict)
+        for i, color in enumerate(self.banner_dict.values()):
+            self.canvas.create_rectangle(left + i * banner_width, top, left + (i + 1) * banner_width,
+                                         top + CANVAS_TILE_BANNER_HEIGHT, fill=color, width=0,
+                                         tags=(self.tag, self.banner_tag),
+                                         state='normal' if self.visible else 'hidden')
+
+
+class BackgroundImageLoader:
+    """
+    Decodes images on a pool of worker threads and hands them to the Tk main thread as they finish
+    Pillow releases the GIL while decoding and resizing, so the workers run in parallel.
+    Tk is not thread safe, so the PhotoImages are only created on the main thread, which polls for finished decodes
+    Images go through the shared ImageCache. Images that already have a PhotoImage there are handed over straight away
+    """
+
+    def __init__(self, widget, images, workers=IMAGE_DECODE_WORKERS):
+        self.widget = widget
+        self.images = images
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # Futures of the jobs that haven't been handed to the main thread yet
+        self.pending = []
+        self.start_time = None
+        self.loaded = 0
+        # Called with the elapsed seconds once every pending image has been handed to its widget
+        self.on_finished = None
+
+    def load(self, path, size, callback):
+        """
+        Starts decoding an image in the background
+        :param path: path to the image
+        :param size: (width, height) to resize to, or None
+        :param callback: called on the main thread with the PhotoImage
+        :return:
+        """
+        photo = self.images.cached_photo(path, size)
+        if photo is not None:
+            callback(photo)
+            return
+
+        self._submit(lambda: [(path, size, self.images.get_pixels(path, size), callback)])
+
+    def load_atlas(self, rects, callbacks):
+        """
+        Starts decoding the character atlas in the background and cutting the requested images out of it
+        :param rects: dictionary of image name to its rectangle in the atlas
+        :param callbacks: dictionary of image name to a list of callbacks that take the PhotoImage
+        :return:
+        """
+        paths = {name: sprite_atlas.character_image_folder + "/" + name for name in rects}
+        missing_rects = {}
+        for name, rect in rects.items():
+            photo = self.images.cached_photo(paths[name])
+            if photo is None:
+                missing_rects[name] = rect
+            else:
+                for callback in callbacks[name]:
+                    callback(photo)
+        if not missing_rects:
+            return
+
+        def job():
+            tiles = sprite_atlas.slice_atlas(missing_rects, self.images)
+            return [(paths[name], None, tiles[name], callback) for name in missing_rects
+                    for callback in callbacks[name]]
+        self._submit(job)
+
+    def _submit(self, job):
+        """
+        Runs a job on the worker threads
+        :param job: function that puts images in the image cache and returns a list of
+            (path, size, PIL image, callback). The PIL image is kept so the main thread never has to decode again
+        :return:
+        """
+        if not self.pending:
+            self.start_time = time.perf_counter()
+            self.loaded = 0
+            self.widget.after(IMAGE_POLL_MS, self._poll)
+
+        self.pending.append(self.executor.submit(job))
+
+    def _poll(self):
+        """
+        Creates the PhotoImages for every finished decode and passes them to their widgets
+        :return:
+        """
+        still_pending = []
+        for future in self.pending:
+            if not future.done():
+                still_pending.append(future)
+                continue
+            try:
+                for path, size, pixels, callback in future.result():
+                    callback(self.images.get_photo(path, size, pixels=pixels))
+                    self.loaded += 1
+            except Exception as e:
+                # Keep the placeholders for this job but keep loading the rest
+                print("Failed to load image: " + str(e))
+        self.pending = still_pending
+
+        if self.pending:
+            self.widget.after(IMAGE_POLL_MS, self._poll)
+        else:
+            elapsed = time.perf_counter() - self.start_time
+            print("Decoded %i images in %.3f s on %i threads" % (self.loaded, elapsed, self.workers))
+            if self.on_finished is not None:
+                self.on_finished(elapsed)
+
+
+class GameHistoryView(tk.Frame):
+    """
+    Scrollable list of previously played games, newest first
+    Games are pulled from an iterator one page at a time as the list is scrolled towards the bottom,
+    so only the games that have been scrolled to (plus a page in reserve) are ever read and formatted
+    """
+
+    def __init__(self, master, page_size=HISTORY_PAGE_SIZE):
+        super().__init__(master)
+        self.page_size = page_size
+
+        # Games that have been loaded so far, in display order
+        self.games = []
+        self.game_iterator = iter(())
+        self.exhausted = True
+
+        self.scrollbar = tk.Scrollbar(self)
+        self.listbox = tk.Listbox(self, yscrollcommand=self._on_scroll)
+        self.scrollbar.configure(command=self.listbox.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.listbox.pack(side='left', fill='both', expand='yes')
+
+    def reset(self, game_iterator):
+        """
+        Clears the display and starts pulling games from a new iterator
+        :param game_iterator: yields Game objects newest first
+        :return:
+        """
+        self.listbox.delete(0, 'end')
+        del self.games[:]
+        self.game_iterator = game_iterator
+        self.exhausted = False
+        self.load_more()
+
+    def load_more(self):
+        """
+        Reads the next page of games from the iterator and appends them to the display
+        :return:
+        """
+        if self.exhausted:
+            return
+
+        page = list(itertools.islice(self.game_iterator, self.page_size))
+        if len(page) < self.page_size:
+            self.exhausted = True
+
+        self.games.extend(page)
+        for new_game in page:
+            self.listbox.insert('end', new_game)
+
+    def add_game(self, new_game):
+        """
+        Inserts a game that was just recorded in its place in the display
+        The history is newest first, so a game that was just played goes to the top
+        :param new_game:
+        :return:
+        """
+        index = 0
+        while index < len(self.games) and self.games[index].time > new_game.time:
+            index += 1
+
+        self.games.insert(index, new_game)
+        self.listbox.insert(index, new_game)
+
+    def remove_game(self, old_game):
+        """
+        Takes a game back out of the display
+        :param old_game: the same Game object that was added
+        :return:
+        """
+        for index, shown_game in enumerate(self.games):
+            if shown_game is old_game:
+                del self.games[index]
+                self.listbox.delete(index)
+                return
+
+    def _on_scroll(self, first, last):
+        """
+        Called by the listbox whenever its view changes
+        Loads the next page once fewer than half a page of loaded games are left below the view
+        :param first: fraction of the list above the view
+        :param last: fraction of the list at the bottom of the view
+        :return:
+        """
+        self.scrollbar.set(first, last)
+        rows_below = (1.0 - float(last)) * len(self.games)
+        if rows_below < self.page_size / 2:
+            self.load_more()
+
+
+def configure_changed(widget, **options):
+    """
+    Configures only the options that differ from the ones last applied to the widget through this function,
+    all in a single configure call. Nothing is sent to Tk if none of them changed
+    The applied options are remembered on the widget. Options set with configure directly aren't tracked
+    :param widget:
+    :param options:
+    :return:
+    """
+    applied = getattr(widget, 'applied_options', None)
+    if applied is None:
+        applied = widget.applied_options = {}
+    changes = {key: value for key, value in options.items() if key not in applied or applied[key] != value}
+    if changes:
+        widget.configure(**changes)
+        applied.update(changes)
 
 
 class SelectionButtonGroup:
     """
     This class is basiccally a radio button class.  But they look like buttons instead of radio buttons
+    Changing the selection only restyles the previously and newly selected buttons
     """
 
     def __init__(self):
         self.selected_index = 0
         self.button_list = []
+        # The button currently styled as selected, and buttons that haven't been styled since they were added
+        self.shown_button = None
+        self.unstyled_buttons = []
 
     def set(self, value):
+        selected_button = None
         for c, button in enumerate(self.button_list):
             if value == button.value:
-                button.set_selected_state()
+                selected_button = button
                 self.selected_index = c
-            else:
+                break
+
+        for button in self.unstyled_buttons:
+            if button is not selected_button:
                 button.set_non_selected_state()
+        self.unstyled_buttons = []
+
+        if self.shown_button is not None and self.shown_button is not selected_button:
+            self.shown_button.set_non_selected_state()
+        if selected_button is not None:
+            selected_button.set_selected_state()
+        self.shown_button = selected_button
 
     def get(self):
         return self.button_list[self.selected_index].value
@@ -966,16 +1635,23 @@ class SelectionButtonGroup:
             if button.value == new_button.value:
                 raise ValueError('Value already in group: ' + str(button.value))
         self.button_list.insert(index, new_button)
+        self.unstyled_buttons.append(new_button)
 
         if index <= self.selected_index:
             self.selected_index += 1
 
     def update(self):
+        """
+        Restyles every button, after their colors have changed. Buttons whose colors didn't change aren't touched
+        :return:
+        """
         for c, button in enumerate(self.button_list):
             if c == self.selected_index:
                 button.set_selected_state()
+                self.shown_button = button
             else:
                 button.set_non_selected_state()
+        self.unstyled_buttons = []
 
     class SelectionFrame(tk.Frame):
 
@@ -984,6 +1660,8 @@ class SelectionButtonGroup:
             self.value = value
             self.on_display = None
             self.off_display = None
+            # None until the first state is shown, then whether the on display is the one packed
+            self.selected = None
 
             selection_group.add(self)
 
@@ -994,12 +1672,18 @@ class SelectionButtonGroup:
             self.off_display = off_display
 
         def set_selected_state(self):
+            if self.selected:
+                return
             self.off_display.pack_forget()
             self.on_display.pack(expand='yes', fill='both')
+            self.selected = True
 
         def set_non_selected_state(self):
+            if self.selected is False:
+                return
             self.on_display.pack_forget()
             self.off_display.pack(expand='yes', fill='both')
+            self.selected = False
 
     class SelectionButton(tk.Button):
         def __init__(self, parent, button_group, value=None, abg='black', afg='white', bg='white', fg='black',
@@ -1023,15 +1707,60 @@ class SelectionButtonGroup:
             self.fg = fg
 
         def set_non_selected_state(self):
-            self.configure(bg=self.bg)
-            self.configure(fg=self.fg)
+            configure_changed(self, bg=self.bg, fg=self.fg)
 
         def set_selected_state(self):
-            self.configure(bg=self.abg)
-            self.configure(fg=self.afg)
+            configure_changed(self, bg=self.abg, fg=self.afg)
 
 
-if __name__ == "__main__":
-    root = SmashApp()
-    app = SmashGui(master=root)
+def main(argv=None):
+    """
+    Parses the command line and runs the gui
+    :param argv: command line arguments. Defaults to sys.argv
+    :return:
+    """
+    global game_log
+    parser = argparse.ArgumentParser(description="Smash Bros game tracker")
+    parser.add_argument("--canvas-grid", action="store_true",
+                        help="draw the character grid on a single canvas instead of a frame per character")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the wall time and allocations of each phase of startup")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="also dump cProfile stats for startup to FILE. Implies --profile-startup")
+    parser.add_argument("--latency", action="store_true",
+                        help="time how long clicks, searches and saves take to show, and print percentiles on exit")
+    parser.add_argument("--latency-output", metavar="FILE",
+                        help="also write the latency percentiles and histograms to FILE as JSON. Implies --latency")
+    parser.add_argument("--latency-overlay", action="store_true",
+                        help="show the latency percentiles over the window while it runs. Implies --latency")
+    parser.add_argument("--image-cache-mb", type=int, default=IMAGE_CACHE_BYTES // (1024 * 1024),
+                        help="memory budget of the decoded image cache in MiB")
+    parser.add_argument("--game-log", metavar="FILE", default=game_log,
+                        help="file games are recorded in. A .db, .sqlite or .sqlite3 file is stored in SQLite")
+    args = parser.parse_args(argv)
+    game_log = args.game_log
+
+    profiler = startup_profiler.StartupProfiler(enabled=args.profile_startup or args.profile_output is not None,
+                                                cprofile_path=args.profile_output)
+    profiler.start()
+    with profiler.phase("tk init"):
+        root = SmashApp()
+    latency_recorder = latency.LatencyRecorder(root)
+    app = SmashGui(master=root, canvas_grid=args.canvas_grid, profiler=profiler, latency_recorder=latency_recorder,
+                   image_cache_bytes=args.image_cache_mb * 1024 * 1024)
+    # Only turned on once the window is built, so setting the default stage isn't counted as a click
+    latency_recorder.enabled = args.latency or args.latency_overlay or args.latency_output is not None
+    if args.latency_overlay:
+        latency.LatencyOverlay(root, latency_recorder)
     app.mainloop()
+    # Games saved right before the window was closed may still be queued
+    app.save_queue.close()
+
+    if latency_recorder.enabled:
+        print(latency_recorder.report())
+        if args.latency_output:
+            latency_recorder.dump(args.latency_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import json
+import math
+import os
+
+from PIL import Image
+
+import characters
+import thumbnails
+
+character_image_folder = os.curdir + "/character_images"
+atlas_image_path = os.curdir + "/resources/character_atlas.png"
+atlas_index_path = os.curdir + "/resources/character_atlas.json"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_atlas(image_names, image_folder=character_image_folder):
+    """
+    Packs images into a single atlas image and writes an index with the rectangle of each one
+    Images are placed in a square grid of cells the size of the largest image
+    :param image_names: file names inside image_folder
+    :param image_folder:
+    :return: number of images packed
+    """
+    images = {name: Image.open(image_folder + "/" + name) for name in sorted(set(image_names))}
+    cell_width = max(image.size[0] for image in images.values())
+    cell_height = max(image.size[1] for image in images.values())
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+
+    atlas = Image.new("RGBA", (columns * cell_width, rows * cell_height))
+    index = {}
+    for i, (name, image) in enumerate(images.items()):
+        x = (i % columns) * cell_width
+        y = (i // columns) * cell_height
+        atlas.paste(image.convert("RGBA"), (x, y))
+        index[name] = {
+            'rect': [x, y, image.size[0], image.size[1]],
+            'source': _source_stamp(image_folder + "/" + name)
+        }
+
+    atlas.save(atlas_image_path)
+    with open(atlas_index_path, "w") as index_file:
+        json.dump({'images': index}, index_file)
+    return len(images)
+
+
+def load_index(image_names, image_folder=character_image_folder, source_stamps=None):
+    """
+    Reads the rectangles of the requested images from the atlas index
+    The sources are only stat'ed, not opened, to check the atlas is still up to date
+    :param image_names: file names inside image_folder
+    :param image_folder:
+    :param source_stamps: image name -> (modification time, size) that is already known, such as the stamps in the
+        resource manifest. The sources aren't stat'ed again if given
+    :return: dictionary of image name to (x, y, width, height), or None if the atlas is missing or out of date
+    """
+    try:
+        with open(atlas_index_path, "r") as index_file:
+            index = json.load(index_file)['images']
+        if not os.path.exists(atlas_image_path):
+            return None
+
+        rects = {}
+        for name in image_names:
+            if source_stamps is not None:
+                stamp = list(source_stamps[name]) if source_stamps.get(name) is not None else None
+            else:
+                stamp = _source_stamp(image_folder + "/" + name)
+            if name not in index or index[name]['source'] != stamp:
+                print("Character atlas is out of date. Rebuild it with: python sprite_atlas.py")
+                return None
+            rects[name] = tuple(index[name]['rect'])
+        return rects
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def slice_atlas(rects, image_cache=None, image_folder=character_image_folder):
+    """
+    Decodes the atlas once and cuts out every requested image
+    :param rects: dictionary of image name to (x, y, width, height)
+    :param image_cache: ImageCache the images are also added to, under the paths of their source images
+    :param image_folder:
+    :return: dictionary of image name to PIL image
+    """
+    atlas = thumbnails.load_image(atlas_image_path)
+    tiles = {}
+    for name, (x, y, width, height) in rects.items():
+        tiles[name] = atlas.crop((x, y, x + width, y + height))
+        if image_cache is not None:
+            image_cache.put_pixels(image_cache.key(image_folder + "/" + name), tiles[name])
+    return tiles
+
+
+if __name__ == "__main__":
+    character_images = [character.image for character in characters.character_data().values()]
+    packed = build_atlas(character_images)
+    print("Packed %i character images into %s" % (packed, atlas_image_path))
@@ -13,10 +13,19 @@ class Stage:
 
     @staticmethod
     def get_stages(stage_json):
-        stage_dict = {}
         with open(stage_json, "r") as open_json:
             stage_data = json.load(open_json)
 
+        return Stage.from_data(stage_data)
+
+    @staticmethod
+    def from_data(stage_data):
+        """
+        Creates every stage from stage data that has already been parsed, such as from the resource manifest
+        :param stage_data: dictionary in the same format as the stage json
+        :return: dictionary of stage name to Stage
+        """
+        stage_dict = {}
         for key, value in stage_data.items():
             stage_dict[key] = Stage.from_dict(value)
 
@@ -0,0 +1,109 @@
+import cProfile
+import sys
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Records the wall time and allocations of each phase of startup and prints a breakdown once startup is over
+    Allocations are the change in allocated memory blocks and traced bytes over the phase.
+    Can also run cProfile over the whole startup and dump the stats to a file.
+    A disabled profiler does nothing, so the gui can always call it
+    """
+
+    def __init__(self, enabled=False, cprofile_path=None):
+        self.enabled = enabled
+        self.cprofile_path = cprofile_path
+        self.profile = None
+        self.start_time = None
+        # (name, seconds, blocks, bytes) in the order the phases finished. blocks and bytes are None if not measured
+        self.phases = []
+        # Phases that finish after the event loop has started. The breakdown is printed once they are all done
+        self.outstanding = set()
+        self.finished = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.start_time = time.perf_counter()
+        tracemalloc.start()
+        if self.cprofile_path:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the code inside the with block as one phase
+        :param name:
+        :return:
+        """
+        if not self.enabled or self.finished:
+            yield
+            return
+
+        start_time = time.perf_counter()
+        start_blocks = sys.getallocatedblocks()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start_time, sys.getallocatedblocks() - start_blocks,
+                                tracemalloc.get_traced_memory()[0] - start_bytes))
+
+    def expect(self, name):
+        """
+        Registers a phase that will be reported later with complete, such as work done in the background
+        :param name:
+        :return:
+        """
+        if self.enabled and not self.finished:
+            self.outstanding.add(name)
+
+    def complete(self, name, seconds=None):
+        """
+        Reports a phase registered with expect. Prints the breakdown once nothing is outstanding
+        :param name:
+        :param seconds: duration of the phase. Defaults to the time since start
+        :return:
+        """
+        if not self.enabled or self.finished or name not in self.outstanding:
+            return
+        if seconds is None:
+            seconds = time.perf_counter() - self.start_time
+        self.phases.append((name, seconds, None, None))
+        self.outstanding.discard(name)
+        if not self.outstanding:
+            self.finish()
+
+    def finish(self):
+        """
+        Stops measuring, prints the breakdown and writes the cProfile stats
+        :return:
+        """
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.start_time
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile_path)
+
+        print(self.report(total, peak))
+        if self.profile is not None:
+            print("cProfile stats written to " + self.cprofile_path)
+
+    def report(self, total, peak):
+        lines = ["Startup profile", "%-32s %10s %12s %12s" % ("phase", "ms", "blocks", "KiB")]
+        for name, seconds, blocks, x_bytes in self.phases:
+            if blocks is None:
+                lines.append("%-32s %10.1f %12s %12s" % (name, seconds * 1000, "-", "-"))
+            else:
+                lines.append("%-32s %10.1f %12i %12.1f" % (name, seconds * 1000, blocks, x_bytes / 1024))
+        lines.append("%-32s %10.1f %12s %12.1f" % ("total (peak traced KiB)", total * 1000, "", peak / 1024))
+        return "\n".join(lines)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+from PIL import Image
+
+# Decoded and resized images are kept here between launches
+thumbnail_cache_folder = os.curdir + "/resources/.thumbnails"
+# Version of the cache file layout. Entries written by another version are decoded again
+CACHE_FORMAT = 2
+
+
+def load_image(path, size=None):
+    """
+    Returns the image at path as a PIL image, resized to size
+    The decoded pixels are cached on disk as raw bytes, so later launches skip decoding and resizing entirely.
+    A cache entry is only used while the source file's modification time and size still match it
+    :param path: path to the source image
+    :param size: (width, height) to resize to, or None to keep the original size
+    :return:
+    """
+    stat = os.stat(path)
+    source = {'mtime': stat.st_mtime_ns, 'bytes': stat.st_size, 'size': list(size) if size else None}
+    cache_path = _cache_path(path, size)
+
+    image = _read_cache(cache_path, source)
+    if image is not None:
+        return image
+
+    image = _self_contained(Image.open(path))
+    if size is not None:
+        image = image.resize(size)
+    _write_cache(cache_path, source, image)
+    return image
+
+
+def _self_contained(image):
+    """
+    The cache only keeps the mode, dimensions and pixel bytes, so palettes and transparency stored in image.info
+    would be lost. Images that use them are converted to RGBA, or RGB when nothing is transparent
+    :param image: PIL image
+    :return: PIL image whose pixels need nothing else to be read back
+    """
+    image.load()
+    if 'transparency' in image.info or image.mode == 'PA':
+        return image.convert('RGBA')
+    if image.mode == 'P':
+        return image.convert('RGBA' if image.palette.mode == 'RGBA' else 'RGB')
+    return image
+
+
+def _cache_path(path, size):
+    """
+    Each source and target size gets one cache file, so a stale entry is overwritten instead of piling up
+    :param path:
+    :param size:
+    :return:
+    """
+    key = hashlib.sha1(("%s|%s" % (os.path.abspath(path), size)).encode()).hexdigest()
+    return os.path.join(thumbnail_cache_folder, key + ".raw")
+
+
+def _read_cache(cache_path, source):
+    """
+    Reads a cached image. The file is a JSON header line followed by the raw pixel data
+    :param cache_path:
+    :param source: description of the source file the entry has to match
+    :return: PIL image, or None if there is no valid entry
+    """
+    try:
+        with open(cache_path, "rb") as cache_file:
+            header = json.loads(cache_file.readline())
+            if header.get('format') != CACHE_FORMAT or header['source'] != source:
+                return None
+            data = cache_file.read()
+        return Image.frombytes(header['mode'], tuple(header['dimensions']), data)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(cache_path, source, image):
+    """
+    Writes an image to the cache. Failing to write only costs the next launch a decode
+    :param cache_path:
+    :param source:
+    :param image:
+    :return:
+    """
+    header = {'format': CACHE_FORMAT, 'source': source, 'mode': image.mode, 'dimensions': list(image.size)}
+    temp_path = cache_path + ".tmp"
+    try:
+        os.makedirs(thumbnail_cache_folder, exist_ok=True)
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(json.dumps(header).encode() + b"\n")
+            cache_file.write(image.tobytes())
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print("Could not cache thumbnail " + cache_path + ": " + str(e))